@@ -0,0 +1,103 @@
+from collections import deque
+
+# Up to this many terms, looking for each term in the text with str's C search is
+# faster than running the automaton over the text in Python
+FIND_TERMS_LIMIT = 64
+
+
+# Return a matcher for the terms with the scan/matched_terms interface below:
+# a TermFinder for a few terms, an AhoCorasick automaton for many
+def create_term_matcher(terms):
+    terms = list(dict.fromkeys(term for term in terms if term))
+    if len(terms) <= FIND_TERMS_LIMIT:
+        return TermFinder(terms)
+    return AhoCorasick(terms)
+
+
+# Finds terms by searching the text once per term not yet found. Each chunk is
+# searched together with the end of the one before, so that matches spanning
+# chunk boundaries are found.
+class TermFinder:
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(term for term in terms if term))
+        self.all_found = (1 << len(self.terms)) - 1
+        self.overlap = max(map(len, self.terms), default=1) - 1
+
+    # Scan text chunks and return the bitmask of terms found, like AhoCorasick.scan
+    def scan(self, chunks):
+        found = 0
+        tail = ""
+        for chunk in chunks:
+            text = tail + chunk if tail else chunk
+            for index, term in enumerate(self.terms):
+                if not found >> index & 1 and term in text:
+                    found |= 1 << index
+            if found == self.all_found:
+                return found
+            tail = text[-self.overlap:] if self.overlap else ""
+        return found
+
+    # Return the terms set in a bitmask, in the order they were given
+    def matched_terms(self, found):
+        return [term for index, term in enumerate(self.terms) if found >> index & 1]
+
+
+# Aho-Corasick automaton that finds any number of terms in one pass over a text.
+# Matches are reported as a bitmask with bit i set when terms[i] was found.
+class AhoCorasick:
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(term for term in terms if term))
+        self.all_found = (1 << len(self.terms)) - 1
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [0]
+
+        # Build the trie of all terms
+        for index, term in enumerate(self.terms):
+            state = 0
+            for char in term:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(0)
+                state = next_state
+            self.out[state] |= 1 << index
+
+        # Breadth-first pass to set failure links and merge outputs along them
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.fail[next_state] == next_state:
+                    self.fail[next_state] = 0
+                self.out[next_state] |= self.out[self.fail[next_state]]
+
+    # Scan text chunks and return the bitmask of terms found. The automaton state
+    # carries over between chunks, so matches spanning chunk boundaries are found.
+    # Stops early once every term has been found.
+    def scan(self, chunks):
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        found = 0
+        for chunk in chunks:
+            for char in chunk:
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                if out[state]:
+                    found |= out[state]
+                    if found == self.all_found:
+                        return found
+        return found
+
+    # Return the terms set in a bitmask, in the order they were given
+    def matched_terms(self, found):
+        return [term for index, term in enumerate(self.terms) if found >> index & 1]
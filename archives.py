@@ -0,0 +1,129 @@
+import posixpath
+import tarfile
+import tempfile
+import zipfile
+
+# Archives whose members are searched, by file name ending
+ZIP_EXTENSIONS = (".zip",)
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ARCHIVE_EXTENSIONS = ZIP_EXTENSIONS + TAR_EXTENSIONS
+
+# Separates an archive from the path of a member inside it: backup.zip!/docs/report.docx
+ARCHIVE_SEPARATOR = "!/"
+
+# Archives nested deeper than this are not opened
+DEFAULT_MAX_DEPTH = 3
+
+# Members are held in memory up to this size and in a temporary file beyond it
+MEMBER_SPOOL_SIZE = 16 * 1024 * 1024
+
+# Bytes copied at a time when reading a member
+COPY_SIZE = 1024 * 1024
+
+
+# Raised when a member turns out to be larger than allowed while it is read
+class MemberTooLarge(ValueError):
+    pass
+
+
+def is_archive(path):
+    return path.endswith(ARCHIVE_EXTENSIONS)
+
+
+# Content of an archive member. Extractors accept it in place of a file path;
+# it formats as the member's path, e.g. backup.zip!/docs/report.docx.
+class ArchiveMember(tempfile.SpooledTemporaryFile):
+    def __init__(self, path):
+        super().__init__(max_size=MEMBER_SPOOL_SIZE)
+        self.path = path
+        self.size = 0
+
+    def __str__(self):
+        return self.path
+
+
+# A regular file in an archive. skipped holds the reason when it cannot be read.
+class ArchiveEntry:
+    def __init__(self, path, size, open_source=None, skipped=None):
+        self.path = path
+        self.size = size
+        self.open_source = open_source
+        self.skipped = skipped
+
+    # Copy the member into an ArchiveMember, raising MemberTooLarge past max_size bytes.
+    # Members of a tar archive can only be read while it is their turn in the iteration.
+    def read(self, max_size=None):
+        member = ArchiveMember(self.path)
+        try:
+            with self.open_source() as source:
+                while True:
+                    chunk = source.read(COPY_SIZE)
+                    if not chunk:
+                        break
+                    member.size += len(chunk)
+                    # The sizes in archive headers can lie, so count what is actually read
+                    if max_size is not None and member.size > max_size:
+                        raise MemberTooLarge(
+                            f"{self.path} is larger than the archive member limit of {max_size // (1024 * 1024)} MB"
+                        )
+                    member.write(chunk)
+        except BaseException:
+            member.close()
+            raise
+        member.seek(0)
+        return member
+
+
+# Yield an ArchiveEntry for every regular file in a zip or tar archive, given as
+# a path or a seekable file object, without extracting anything to disk. Archives
+# inside the archive are opened in turn, down to max_depth levels of nesting;
+# nested archives over max_size bytes are skipped.
+def iter_archive(source, archive_path, max_size=None, max_depth=DEFAULT_MAX_DEPTH, depth=1):
+    if archive_path.endswith(ZIP_EXTENSIONS):
+        entries = _zip_entries(source, archive_path)
+    else:
+        entries = _tar_entries(source, archive_path)
+    for entry in entries:
+        if entry.skipped is not None or not is_archive(entry.path):
+            yield entry
+            continue
+        if depth >= max_depth:
+            entry.skipped = f"archive nested more than {max_depth} levels deep"
+            yield entry
+            continue
+        if max_size is not None and entry.size > max_size:
+            entry.skipped = f"nested archive of {entry.size / (1024 * 1024):.1f} MB is over the archive member limit"
+            yield entry
+            continue
+        try:
+            with entry.read(max_size) as nested:
+                yield from iter_archive(nested, entry.path, max_size, max_depth, depth + 1)
+        except Exception as e:
+            # A damaged nested archive only ends the search of that archive
+            yield ArchiveEntry(entry.path, entry.size, skipped=f"could not read nested archive: {e}")
+
+
+def _zip_entries(source, archive_path):
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            path = archive_path + ARCHIVE_SEPARATOR + info.filename
+            if info.flag_bits & 0x1:
+                yield ArchiveEntry(path, info.file_size, skipped="encrypted archive member")
+                continue
+            yield ArchiveEntry(path, info.file_size, lambda info=info: archive.open(info))
+
+
+def _tar_entries(source, archive_path):
+    # Stream mode reads a compressed tar front to back once, without seeking
+    if isinstance(source, str):
+        archive = tarfile.open(source, mode="r|*")
+    else:
+        archive = tarfile.open(fileobj=source, mode="r|*")
+    with archive:
+        for info in archive:
+            if not info.isfile():
+                continue
+            path = archive_path + ARCHIVE_SEPARATOR + posixpath.normpath(info.name).lstrip("/")
+            yield ArchiveEntry(path, info.size, lambda info=info: archive.extractfile(info))
@@ -0,0 +1,519 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import fitz  # PyMuPDF
+from docx import Document
+from openpyxl import Workbook
+from pptx import Presentation
+from pptx.util import Inches
+
+from main import (
+    EXTRACTORS,
+    clear_log_files,
+    configure_cancel_event,
+    configure_pdf_search,
+    create_worker_pool,
+    read_text,
+    search_files,
+    search_text_in_file,
+    start_log_listener,
+    stop_log_listener,
+    text_in_chunks,
+)
+from text_cache import configure_text_cache
+from walker import Walker
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Peak RSS is not reported on Windows
+
+DEFAULT_CORPUS_DIR = "benchmark_corpus"
+MANIFEST_FILE = "manifest.json"
+
+# Word written into the files that should match; a single word so that no
+# extractor splits it across lines, cells or text runs
+NEEDLE = "ZQXNEEDLE42"
+
+# Where the needle goes in a matching file, taken in turn (default of --needle-placements)
+NEEDLE_PLACEMENTS = ["start", "middle", "end"]
+
+# Encodings of the generated .txt files, taken in turn (default of --txt-encodings)
+TXT_ENCODINGS = ["utf-8", "utf-8-sig", "utf-16", "cp1252"]
+
+# Filler words; the accented ones are all representable in cp1252
+WORDS = (
+    "the quick brown fox jumps over lazy dog invoice report quarter revenue customer account "
+    "server cluster latency throughput budget forecast meeting summary action item review "
+    "café naïve façade über señor déjà vu résumé Zürich Ångström"
+).split()
+
+# Modules that main.py must not import until a file of their format is searched
+HEAVY_MODULES = ["fitz", "openpyxl", "chardet", "docx", "pptx", "http.server", "logging.handlers"]
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LINE_LENGTH = 90
+PDF_LINES_PER_PAGE = 60
+PPTX_LINES_PER_SLIDE = 15
+
+
+# Build the lines of one file: about size_kb kilobytes of filler words, with
+# the needle at the given placement (None leaves it out)
+def generate_lines(rng, size_kb, placement):
+    words = []
+    length = 0
+    while length < size_kb * 1024:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    if placement == "start":
+        words.insert(0, NEEDLE)
+    elif placement == "middle":
+        words.insert(len(words) // 2, NEEDLE)
+    elif placement == "end":
+        words.append(NEEDLE)
+
+    lines = []
+    line = []
+    line_length = 0
+    for word in words:
+        if line and line_length + len(word) > LINE_LENGTH:
+            lines.append(" ".join(line))
+            line = []
+            line_length = 0
+        line.append(word)
+        line_length += len(word) + 1
+    if line:
+        lines.append(" ".join(line))
+    return lines
+
+
+# The writers take the path, the lines and the text encoding, which only .txt files use
+def write_txt(path, lines, encoding):
+    with open(path, "w", encoding=encoding, newline="\n") as f:
+        f.write("\n".join(lines))
+
+
+def write_pdf(path, lines, encoding):
+    doc = fitz.open()
+    for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+        page = doc.new_page()
+        for offset, line in enumerate(lines[start:start + PDF_LINES_PER_PAGE]):
+            page.insert_text((36, 50 + offset * 12), line, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def write_docx(path, lines, encoding):
+    document = Document()
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(path)
+
+
+def write_pptx(path, lines, encoding):
+    presentation = Presentation()
+    layout = presentation.slide_layouts[6]  # Blank
+    for start in range(0, len(lines), PPTX_LINES_PER_SLIDE):
+        slide = presentation.slides.add_slide(layout)
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6.5))
+        box.text_frame.text = "\n".join(lines[start:start + PPTX_LINES_PER_SLIDE])
+    presentation.save(path)
+
+
+def write_xlsx(path, lines, encoding):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    for row, line in enumerate(lines):
+        words = line.split()
+        half = len(words) // 2
+        sheet.append([" ".join(words[:half]), " ".join(words[half:]), row * 1.5])
+    workbook.save(path)
+
+
+WRITERS = {
+    ".txt": write_txt,
+    ".pdf": write_pdf,
+    ".docx": write_docx,
+    ".pptx": write_pptx,
+    ".xlsx": write_xlsx,
+}
+
+
+# Create the corpus unless the directory already holds one generated with the same
+# parameters. Returns the manifest: the parameters and the files expected to match.
+def generate_corpus(
+    corpus_dir,
+    files_per_format,
+    size_kb,
+    needle_ratio,
+    seed,
+    formats,
+    txt_encodings=TXT_ENCODINGS,
+    needle_placements=NEEDLE_PLACEMENTS,
+    regenerate=False,
+):
+    parameters = {
+        "files_per_format": files_per_format,
+        "size_kb": size_kb,
+        "needle_ratio": needle_ratio,
+        "seed": seed,
+        "formats": sorted(formats),
+        "txt_encodings": list(txt_encodings),
+        "needle_placements": list(needle_placements),
+        "needle": NEEDLE,
+    }
+    manifest_path = os.path.join(corpus_dir, MANIFEST_FILE)
+    if not regenerate and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("parameters") == parameters:
+            return manifest
+
+    expected = []
+    for extension in sorted(formats):
+        format_dir = os.path.join(corpus_dir, extension.lstrip("."))
+        os.makedirs(format_dir, exist_ok=True)
+        for index in range(files_per_format):
+            # Seed per file so a file's content does not depend on the other formats
+            rng = random.Random(f"{seed}:{extension}:{index}")
+            placement = None
+            if rng.random() < needle_ratio:
+                placement = needle_placements[index % len(needle_placements)]
+            path = os.path.join(format_dir, f"file{index:05d}{extension}")
+            encoding = txt_encodings[index % len(txt_encodings)]
+            WRITERS[extension](path, generate_lines(rng, size_kb, placement), encoding)
+            if placement:
+                expected.append(os.path.abspath(path))
+
+    manifest = {"parameters": parameters, "expected_matches": sorted(expected)}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# Peak resident set size in KB of this process or of its finished children
+def peak_rss_kb(children=False):
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+# Run a function repeat times and return (best time in seconds, last result)
+def best_of(repeat, function, *args):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def _rate(amount, seconds, digits=1):
+    return round(amount / seconds, digits) if seconds else None
+
+
+def benchmark_walk(corpus_dir, repeat):
+    walker = Walker(extensions=EXTRACTORS)
+    seconds, files = best_of(repeat, lambda: list(walker.walk(corpus_dir)))
+    return files, {"files": len(files), "seconds": round(seconds, 4), "files_per_second": _rate(len(files), seconds)}
+
+
+# Time extraction, matching and the per-file search for one format
+def benchmark_format(extension, file_paths, expected, repeat):
+    extractor = EXTRACTORS[extension]
+    size = sum(os.path.getsize(path) for path in file_paths)
+
+    extract_seconds, texts = best_of(repeat, lambda: [read_text(path, extractor) for path in file_paths])
+    text_bytes = sum(len(text.encode("utf-8")) for text in texts if text is not None)
+    match_seconds, _ = best_of(repeat, lambda: [text_in_chunks([text], NEEDLE) for text in texts if text is not None])
+    search_seconds, found = best_of(repeat, lambda: [search_text_in_file(path, NEEDLE) for path in file_paths])
+
+    # A benchmark that returns wrong answers is not measuring the real search
+    wrong = [path for path, match in zip(file_paths, found) if match != (os.path.abspath(path) in expected)]
+    return {
+        "files": len(file_paths),
+        "bytes": size,
+        "text_bytes": text_bytes,
+        "extract_seconds": round(extract_seconds, 4),
+        "extract_files_per_second": _rate(len(file_paths), extract_seconds),
+        "extract_mb_per_second": _rate(size / 1e6, extract_seconds, 2),
+        "match_seconds": round(match_seconds, 4),
+        "match_mb_per_second": _rate(text_bytes / 1e6, match_seconds, 2),
+        "search_seconds": round(search_seconds, 4),
+        "search_files_per_second": _rate(len(file_paths), search_seconds),
+        "search_mb_per_second": _rate(size / 1e6, search_seconds, 2),
+        "wrong_results": wrong,
+    }
+
+
+def benchmark_search_files(corpus_dir, files, expected, workers, repeat):
+    size = sum(os.path.getsize(path) for path in files)
+    executor = create_worker_pool(workers)
+    try:
+        seconds, matches = best_of(repeat, lambda: search_files(corpus_dir, NEEDLE, executor=executor))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    matches = sorted(os.path.abspath(path) for path in matches)
+    return {
+        "workers": workers,
+        "seconds": round(seconds, 4),
+        "files_per_second": _rate(len(files), seconds),
+        "mb_per_second": _rate(size / 1e6, seconds, 2),
+        "matches": len(matches),
+        "expected_matches": len(expected),
+        "correct": matches == sorted(expected),
+    }
+
+
+# Time fresh interpreters: importing main, "main.py --help" and a serial .txt-only
+# search, and list the heavy modules that importing main pulls in
+def benchmark_startup(corpus_dir, repeat):
+    main_script = os.path.join(PACKAGE_DIR, "main.py")
+    import_main = f"import sys; sys.path.insert(0, {PACKAGE_DIR!r}); import main"
+
+    def run(command, input_text=None):
+        # Run inside the corpus so the log files of these runs stay out of the working directory
+        subprocess.run(command, cwd=corpus_dir, input=input_text, capture_output=True, text=True, check=True)
+
+    import_seconds, _ = best_of(repeat, run, [sys.executable, "-c", import_main])
+    help_seconds, _ = best_of(repeat, run, [sys.executable, main_script, "--help"])
+    txt_search_seconds, _ = best_of(
+        repeat,
+        run,
+        [sys.executable, main_script, "--workers", "1", "--no-cache"],
+        f"{NEEDLE}\n{os.path.join(os.path.abspath(corpus_dir), 'txt')}\n.txt\n",
+    )
+    check = f"{import_main}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True).stdout.split()
+    return {
+        "import_seconds": round(import_seconds, 4),
+        "help_seconds": round(help_seconds, 4),
+        "txt_search_seconds": round(txt_search_seconds, 4),
+        "heavy_modules_at_import": loaded,
+    }
+
+
+# Run the whole benchmark and return the results as a JSON-serializable dict
+def run_benchmark(args):
+    formats = [f".{name.strip().lstrip('.')}" for name in args.formats.split(",") if name.strip()]
+    for extension in formats:
+        if extension not in WRITERS:
+            raise SystemExit(f"Unknown format: {extension}")
+    txt_encodings = [name.strip() for name in args.txt_encodings.split(",") if name.strip()]
+    if not txt_encodings:
+        raise SystemExit("No .txt encodings given")
+    for encoding in txt_encodings:
+        try:
+            (" ".join(WORDS) + NEEDLE).encode(encoding)
+        except LookupError:
+            raise SystemExit(f"Unknown encoding: {encoding}")
+        except UnicodeError:
+            raise SystemExit(f"Encoding {encoding} cannot write the corpus words")
+    needle_placements = [name.strip() for name in args.needle_placements.split(",") if name.strip()]
+    if not needle_placements:
+        raise SystemExit("No needle placements given")
+    for placement in needle_placements:
+        if placement not in NEEDLE_PLACEMENTS:
+            raise SystemExit(f"Unknown needle placement: {placement} (use {', '.join(NEEDLE_PLACEMENTS)})")
+
+    print(f"Preparing corpus in {args.corpus}...", flush=True)
+    manifest = generate_corpus(
+        args.corpus,
+        args.files,
+        args.size_kb,
+        args.needle_ratio,
+        args.seed,
+        formats,
+        txt_encodings,
+        needle_placements,
+        args.regenerate,
+    )
+    expected = set(manifest["expected_matches"])
+
+    # Measure extraction itself, not the cache
+    configure_text_cache(None)
+    configure_pdf_search(False)
+    configure_cancel_event(None)
+
+    print("Walking...", flush=True)
+    files, walk = benchmark_walk(args.corpus, args.repeat)
+
+    results = {}
+    for extension in formats:
+        print(f"Benchmarking {extension}...", flush=True)
+        file_paths = sorted(path for path in files if path.endswith(extension))
+        results[extension] = benchmark_format(extension, file_paths, expected, args.repeat)
+
+    print(f"Running search_files with {args.workers} worker(s)...", flush=True)
+    end_to_end = benchmark_search_files(args.corpus, files, expected, args.workers, args.repeat)
+
+    startup = None
+    if ".txt" in formats:
+        print("Timing startup...", flush=True)
+        startup = benchmark_startup(args.corpus, args.repeat)
+
+    return {
+        "parameters": manifest["parameters"],
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "walk": walk,
+        "formats": results,
+        "search_files": end_to_end,
+        "startup": startup,
+        "peak_rss_kb": {"main": peak_rss_kb(), "workers": peak_rss_kb(children=True)},
+    }
+
+
+# Flatten nested results into {"formats.pdf.extract_mb_per_second": value, ...}
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key.lstrip('.')}."))
+        else:
+            flat[f"{prefix}{key.lstrip('.')}"] = value
+    return flat
+
+
+# Compare the throughput and startup figures with a baseline run and return the regressions:
+# (metric, baseline value, current value) for every rate that dropped, or startup time
+# that grew, by more than threshold
+def compare_results(results, baseline, threshold):
+    current = flatten(results)
+    regressions = []
+    for metric, old in sorted(flatten(baseline).items()):
+        if metric.endswith("_per_second"):
+            sign = 1  # Higher is better
+        elif metric.startswith("startup.") and metric.endswith("_seconds"):
+            sign = -1  # Lower is better
+        else:
+            continue
+        new = current.get(metric)
+        if new is None or not old:
+            continue
+        change = (new - old) / old
+        marker = ""
+        if sign * change < -threshold:
+            regressions.append((metric, old, new))
+            marker = "  REGRESSION"
+        print(f"{metric}: {old} -> {new} ({change:+.1%}){marker}")
+    return regressions
+
+
+def print_results(results):
+    walk = results["walk"]
+    print(f"\nWalk: {walk['files']} files in {walk['seconds']:.3f}s ({walk['files_per_second']} files/s)")
+    print(f"{'Format':<8}{'Files':>7}{'Extract MB/s':>14}{'Match MB/s':>12}{'Search files/s':>16}")
+    for extension, stats in results["formats"].items():
+        print(
+            f"{extension:<8}{stats['files']:>7}{stats['extract_mb_per_second'] or 0:>14}"
+            f"{stats['match_mb_per_second'] or 0:>12}{stats['search_files_per_second'] or 0:>16}"
+        )
+        if stats["wrong_results"]:
+            print(f"  Wrong results for {len(stats['wrong_results'])} file(s), e.g. {stats['wrong_results'][0]}")
+    end_to_end = results["search_files"]
+    print(
+        f"search_files: {end_to_end['seconds']:.3f}s, {end_to_end['files_per_second']} files/s, "
+        f"{end_to_end['mb_per_second']} MB/s, {end_to_end['matches']}/{end_to_end['expected_matches']} matches"
+        + ("" if end_to_end["correct"] else " (WRONG)")
+    )
+    startup = results["startup"]
+    if startup is not None:
+        print(
+            f"Startup: import {startup['import_seconds']:.3f}s, --help {startup['help_seconds']:.3f}s, "
+            f".txt search {startup['txt_search_seconds']:.3f}s"
+        )
+        if startup["heavy_modules_at_import"]:
+            print(f"  Importing main loads {', '.join(startup['heavy_modules_at_import'])}")
+    rss = results["peak_rss_kb"]
+    if rss["main"] is not None:
+        print(f"Peak RSS: main {rss['main'] / 1024:.1f} MB, workers {rss['workers'] / 1024:.1f} MB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark text extraction and search on a generated corpus.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR, help=f"Corpus directory (default: {DEFAULT_CORPUS_DIR})")
+    parser.add_argument("--regenerate", action="store_true", help="Recreate the corpus even if it matches the parameters")
+    parser.add_argument("--formats", default=",".join(sorted(WRITERS)), help="Comma-separated formats to generate and time")
+    parser.add_argument("--files", type=int, default=20, help="Files per format (default: 20)")
+    parser.add_argument("--size-kb", type=int, default=64, help="Text per file in KB (default: 64)")
+    parser.add_argument(
+        "--needle-ratio",
+        type=float,
+        default=0.5,
+        help="Fraction of files that contain the search text (default: 0.5)",
+    )
+    parser.add_argument(
+        "--txt-encodings",
+        default=",".join(TXT_ENCODINGS),
+        help=f"Comma-separated encodings of the .txt files, used in turn (default: {','.join(TXT_ENCODINGS)})",
+    )
+    parser.add_argument(
+        "--needle-placements",
+        default=",".join(NEEDLE_PLACEMENTS),
+        help=f"Comma-separated positions of the search text in matching files, used in turn "
+        f"(default: {','.join(NEEDLE_PLACEMENTS)})",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the corpus contents (default: 0)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for the search_files run (default: CPU count)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best is kept (default: 3)")
+    parser.add_argument("--output", metavar="FILE", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="Compare with the results of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Report a regression when a rate drops by more than this fraction (default: 0.10)",
+    )
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    clear_log_files()
+    start_log_listener()
+    try:
+        results = run_benchmark(args)
+    finally:
+        stop_log_listener()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nComparison with {args.baseline}:")
+        if baseline.get("parameters") != results["parameters"]:
+            print("Warning: the baseline was run on a corpus with different parameters")
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import hashlib
+import os
+
+from archives import is_archive
+
+# Bytes hashed from the start and from the end of a file before hashing all of it
+PARTIAL_HASH_SIZE = 64 * 1024
+
+# Bytes read at a time for the full hash
+HASH_READ_SIZE = 1024 * 1024
+
+
+# Finds files whose content was already seen in a walk, so that it is extracted
+# and searched once: hardlinks by device and inode, copies by content. Contents
+# are only hashed when two files have the same size, first the start and end of
+# the files and then, if those agree, all of them. With a TextCache, files whose
+# text is cached are only hashed when an uncached file of the same size turns up,
+# and the hashes are stored in the cache for later searches.
+class Deduplicator:
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.inodes = {}  # (st_dev, st_ino, is archive) -> first path
+        self.sizes = {}  # (size, is archive) -> first path of every distinct content of that size
+        self.stats = {}  # path -> stat of the files compared by content
+        self.partial_hashes = {}
+        self.full_hashes = {}
+        self.originals = {}  # duplicate path -> path of the first file with its content
+
+    # Return the earlier file with the same content as file_path, or None if its
+    # content was not seen before
+    def original_of(self, file_path):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None  # Reported when the file is searched
+        # An archive is searched for its members, so it never shares a result
+        # with a document of the same bytes, such as a .docx
+        archive = is_archive(file_path)
+        inode = (stat.st_dev, stat.st_ino, archive)
+        original = self.inodes.get(inode)
+        if original is None:
+            self.inodes[inode] = file_path
+            original = self._same_content(file_path, stat, archive)
+        if original is not None:
+            # A hardlink to a copy shares the first copy's result
+            original = self.originals.get(original, original)
+            self.originals[file_path] = original
+        return original
+
+    def _same_content(self, file_path, stat, archive):
+        self.stats[file_path] = stat
+        candidates = self.sizes.setdefault((stat.st_size, archive), [])
+        if self.cache is not None and self.cache.contains(file_path, stat):
+            # Reading its cached text costs less than hashing it, but a later copy
+            # that is not cached can still share its result
+            candidates.append(file_path)
+            return None
+        try:
+            for candidate in candidates:
+                if self._partial_hash(candidate) != self._partial_hash(file_path):
+                    continue
+                if stat.st_size <= 2 * PARTIAL_HASH_SIZE or self._full_hash(candidate) == self._full_hash(file_path):
+                    return candidate
+        except OSError:
+            return None  # Searched on its own; the search reports the error
+        candidates.append(file_path)
+        return None
+
+    def _partial_hash(self, file_path):
+        digest = self.partial_hashes.get(file_path) or self._stored_hashes(file_path)[0]
+        if digest is None:
+            with open(file_path, "rb") as f:
+                if self.stats[file_path].st_size <= 2 * PARTIAL_HASH_SIZE:
+                    data = f.read()
+                else:
+                    data = f.read(PARTIAL_HASH_SIZE)
+                    f.seek(-PARTIAL_HASH_SIZE, os.SEEK_END)
+                    data += f.read(PARTIAL_HASH_SIZE)
+            digest = self.partial_hashes[file_path] = hashlib.blake2b(data).digest()
+            self._store_hashes(file_path)
+        return digest
+
+    def _full_hash(self, file_path):
+        digest = self.full_hashes.get(file_path) or self._stored_hashes(file_path)[1]
+        if digest is None:
+            hasher = hashlib.blake2b()
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_READ_SIZE), b""):
+                    hasher.update(chunk)
+            digest = self.full_hashes[file_path] = hasher.digest()
+            self._store_hashes(file_path)
+        return digest
+
+    # Hashes of the file stored by an earlier search, as (partial, full)
+    def _stored_hashes(self, file_path):
+        if self.cache is None:
+            return None, None
+        partial, full = self.cache.get_hashes(file_path, self.stats[file_path])
+        if partial is not None:
+            self.partial_hashes[file_path] = partial
+        if full is not None:
+            self.full_hashes[file_path] = full
+        return partial, full
+
+    def _store_hashes(self, file_path):
+        if self.cache is not None:
+            self.cache.put_hashes(
+                file_path, self.stats[file_path], self.partial_hashes.get(file_path), self.full_hashes.get(file_path)
+            )
+
+    # Groups of identical files found so far: first path -> its duplicates, in walk order
+    def groups(self):
+        groups = {}
+        for duplicate, original in self.originals.items():
+            groups.setdefault(original, []).append(duplicate)
+        return groups
@@ -1,180 +1,145 @@
 import os
-import fitz
-import sys
-import fnmatch
-import logging
-from docx import Document  # For .docx files
-from pptx import Presentation  # For .pptx files
-from openpyxl import load_workbook  # For .xlsx files
-import chardet
+import multiprocessing
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 import threading
 import time
-
-# Configure logging for successful file paths
-success_logger = logging.getLogger("success_logger")
-success_logger.setLevel(logging.INFO)
-success_handler = logging.FileHandler("success.log")
-success_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
-success_logger.addHandler(success_handler)
-
-# Configure logging for unsuccessful file paths
-unsuccessful_logger = logging.getLogger("unsuccessful_logger")
-unsuccessful_logger.setLevel(logging.WARNING)
-unsuccessful_handler = logging.FileHandler("unsuccessful.log")
-unsuccessful_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
-unsuccessful_logger.addHandler(unsuccessful_handler)
-
-# Store handlers in a list for later access
-log_handlers = [success_handler, unsuccessful_handler]
-
-def clear_log_files():
-    log_files = ["success.log", "unsuccessful.log"]
-    
-    # Close all logging handlers
-    for handler in log_handlers:
-        handler.close()
-    
-    # Delete log files
-    for log_file in log_files:
-        if os.path.exists(log_file):
-            os.remove(log_file)
-
-# Extract text from .pdf file
-def extract_text_from_pdf(pdf_path):
-    try:
-        text = ""
-        doc = fitz.open(pdf_path)
-
-        for page in doc:
-            text += page.get_text("text") + "\n"
-
-        success_logger.info(f"Successfully processed: {pdf_path}")
-        return text.strip()
-    except Exception as e:
-        error_message = f"Error extracting text from PDF {pdf_path}: {e}"
-        unsuccessful_logger.warning(f"Unsuccessful: {pdf_path} - {error_message}")
-        return ""
-
-# Extract text from .txt file
-def extract_text_from_txt(file_path):
-    try:
-        # Detect file encoding
-        with open(file_path, "rb") as f:
-            raw_data = f.read(10000)  # Read a sample of the file to detect encoding
-            detected = chardet.detect(raw_data)
-            encoding = detected["encoding"] if detected["encoding"] else "utf-8"
-
-        # Read file using detected encoding
-        with open(file_path, "r", encoding=encoding, errors="replace") as file:
-            text = file.read().strip()
-            success_logger.info(f"Successfully processed: {file_path}")
-            return text
-    except Exception as e:
-        error_message = f"Error reading .txt file {file_path}: {e}"
-        unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
-        return ""
-
-# Extract text from .docx file
-def extract_text_from_docx(file_path):
-    try:
-        doc = Document(file_path)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        success_logger.info(f"Successfully processed: {file_path}")
-        return text.strip()
-    except Exception as e:
-        error_message = f"Error reading .docx file {file_path}: {e}"
-        unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
-        return ""
-
-# Extract text from .pptx file
-def extract_text_from_pptx(file_path):
-    try:
-        ppt = Presentation(file_path)
-        text = ""
-        for slide in ppt.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        success_logger.info(f"Successfully processed: {file_path}")
-        return text.strip()
-    except Exception as e:
-        error_message = f"Error reading .pptx file {file_path}: {e}"
-        unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
-        return ""
-
-# Extract text from .xlsx file
-def extract_text_from_xlsx(file_path):
-    try:
-        workbook = load_workbook(file_path)
-        text = ""
-        for sheet in workbook:
-            for row in sheet.iter_rows(values_only=True):
-                row_text = " ".join(str(cell) for cell in row if cell)
-                text += row_text + "\n"
-        success_logger.info(f"Successfully processed: {file_path}")
-        return text.strip()
-    except Exception as e:
-        error_message = f"Error reading .xlsx file {file_path}: {e}"
-        unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
-        return ""
-
-# Search for text in a file
-def search_text_in_file(file_path, search_text):
-    try:
-        if file_path.endswith(".pdf"):
-            text = extract_text_from_pdf(file_path)
-        elif file_path.endswith(".txt"):
-            text = extract_text_from_txt(file_path)
-        elif file_path.endswith(".docx"):
-            text = extract_text_from_docx(file_path)
-        elif file_path.endswith(".pptx"):
-            text = extract_text_from_pptx(file_path)
-        elif file_path.endswith(".xlsx"):
-            text = extract_text_from_xlsx(file_path)
+import queue
+from main import (
+    DEFAULT_DAEMON_ADDRESS,
+    clear_log_files,
+    configure_cancel_event,
+    configure_search_stats,
+    create_cancel_event,
+    create_worker_pool,
+    get_root_directories,
+    iter_search,
+    read_terms,
+    start_log_listener,
+    stop_log_listener,
+    watch_search,
+)
+from dedup import Deduplicator
+from result_store import FOUND_ORDER, SORT_ORDERS, ResultStore
+from scan_journal import DEFAULT_JOURNAL_PATH, ScanJournal
+from search_stats import SearchStats
+from text_cache import configure_text_cache, get_text_cache
+
+# How often the UI picks up new matches from the search thread
+RESULT_POLL_MS = 100
+
+# Most matches taken from the search thread per poll, so that a burst of matches
+# cannot hold up the UI; the rest are picked up by the next polls
+MAX_RESULTS_PER_POLL = 10000
+
+# The filter is applied once typing has paused for this long
+FILTER_DELAY_MS = 300
+
+# Rows scrolled per step of the mouse wheel
+WHEEL_ROWS = 3
+
+# Put on the result queue when the search thread is finished
+SEARCH_DONE = object()
+
+# Put on the result queue when the initial search is finished and watching starts
+WATCHING = object()
+
+# Put on the result queue as (MATCH_REMOVED, match) when a watched match goes away
+MATCH_REMOVED = object()
+
+# Shows the rows of a ResultStore in a textbox that only ever holds the rows on
+# screen, however many matches there are. The scrollbar moves through all rows.
+class ResultsView(ctk.CTkFrame):
+    def __init__(self, master, store, **kwargs):
+        super().__init__(master, **kwargs)
+        self.store = store
+        self.top = 0  # Index of the first row on screen
+        self.visible_rows = 1
+        self.line_height = None
+        self.drawn = None  # What is on screen, to skip redrawing the same rows
+        self.message = ""  # Shown when there are no rows
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.text = ctk.CTkTextbox(
+            self, width=530, height=150, font=("Arial", 12), wrap="none", activate_scrollbars=False
+        )
+        self.text.grid(row=0, column=0, sticky="nsew")
+        self.y_scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.y_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.x_scrollbar = ctk.CTkScrollbar(self, orientation="horizontal", command=self.text.xview)
+        self.x_scrollbar.grid(row=1, column=0, sticky="ew")
+        self.text.configure(xscrollcommand=self.x_scrollbar.set)
+
+        # The textbox would only scroll through the rows it holds
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.text.bind(sequence, self.on_mouse_wheel)
+        self.text.bind("<Prior>", lambda event: self.page(-1))
+        self.text.bind("<Next>", lambda event: self.page(1))
+        self.text.bind("<Configure>", lambda event: self.refresh())
+
+    # Scrollbar command: ("moveto", fraction) or ("scroll", count, "units" or "pages")
+    def yview(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(round(float(amount) * len(self.store.view())))
         else:
-            return False  # Skip unsupported file types
-
-        # Check for exact case-sensitive match
-        if search_text in text:
-            return True
-        return False
-    except Exception as e:
-        error_message = f"Error searching in file {file_path}: {e}"
-        unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
-        return False
-
-# Recursively search for files and check for text
-def search_files(directory, search_text, file_extension=None):
-    matches = []
-    for root, _, files in os.walk(directory, onerror=lambda e: None):
-        for file in files:
-            file_path = os.path.join(root, file)
-            # Check if the file matches the extension (if provided)
-            if file_extension and not fnmatch.fnmatch(file, f"*{file_extension}"):
-                continue
-            if search_text_in_file(file_path, search_text):
-                matches.append(file_path)  # Add matching file to the list
-    return matches
-
-# Get root directories based on OS
-def get_root_directories():
-    if sys.platform == "linux":
-        return ["/"]
-    elif sys.platform == "win32":
-        return [
-            f"{chr(65 + i)}:/" for i in range(26) if os.path.exists(f"{chr(65 + i)}:/")
-        ]
-    else:
-        raise Exception("Unsupported operating system")
+            self.scroll_to(self.top + int(amount) * (self.visible_rows if unit == "pages" else 1))
+
+    def on_mouse_wheel(self, event):
+        # Button-4 scrolls up on X11; elsewhere the sign of delta gives the direction
+        direction = -1 if event.num == 4 or event.delta > 0 else 1
+        self.scroll_to(self.top + direction * WHEEL_ROWS)
+        return "break"
+
+    def page(self, direction):
+        self.scroll_to(self.top + direction * self.visible_rows)
+        return "break"
+
+    def scroll_to(self, top):
+        self.top = top
+        self.refresh()
+
+    def show_message(self, message):
+        self.message = message
+        self.refresh()
+
+    # Draw the rows at the scroll position, if they changed since the last call
+    def refresh(self):
+        rows = self.store.view()
+        self.visible_rows = self._fit_rows()
+        self.top = max(0, min(self.top, len(rows) - self.visible_rows))
+        state = (self.store.version, self.top, self.visible_rows, self.message)
+        if state == self.drawn:
+            return
+        self.drawn = state
+
+        left = self.text.xview()[0]
+        self.text.delete("1.0", "end")
+        if rows:
+            window = rows[self.top:self.top + self.visible_rows]
+            self.text.insert("1.0", "\n".join(self.store.line(path) for path in window))
+            self.y_scrollbar.set(self.top / len(rows), min(1.0, (self.top + self.visible_rows) / len(rows)))
+        else:
+            self.text.insert("1.0", self.message)
+            self.y_scrollbar.set(0.0, 1.0)
+        # Keep the horizontal position while rows stream in
+        self.text.xview_moveto(left)
+
+    # Rows that fit in the textbox, less one for its border and a partly shown row
+    def _fit_rows(self):
+        if self.line_height is None:
+            line = self.text.dlineinfo("1.0")  # None until the textbox is on screen
+            if line is None:
+                return max(self.visible_rows, 10)
+            self.line_height = line[3]
+        return max(1, self.text.winfo_height() // self.line_height - 1)
 
 # GUI Application
 class SearchApp(ctk.CTk):
     def __init__(self):
         super().__init__()
         self.title("File Search Tool")
-        self.geometry("600x450")
+        self.geometry("600x500")
         self.configure(bg="#2E3440")
 
         # Theme and appearance
@@ -218,11 +183,42 @@ class SearchApp(ctk.CTk):
         )
         self.file_type_dropdown.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
 
+        # Number of worker processes
+        self.workers_label = ctk.CTkLabel(self.input_frame, text="Worker Processes:", font=("Arial", 14))
+        self.workers_label.grid(row=3, column=0, padx=5, pady=5, sticky="w")
+
+        self.workers_var = ctk.StringVar(value=str(os.cpu_count() or 1))
+        self.workers_entry = ctk.CTkEntry(self.input_frame, textvariable=self.workers_var, width=80, font=("Arial", 12))
+        self.workers_entry.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+
+        # Load many search terms from a file (searched in one pass)
+        self.terms_label = ctk.CTkLabel(self.input_frame, text="Or Search Terms File:", font=("Arial", 14))
+        self.terms_label.grid(row=4, column=0, padx=5, pady=5, sticky="w")
+
+        self.terms_button = ctk.CTkButton(
+            self.input_frame, text="Load Terms...", command=self.load_terms, font=("Arial", 12), fg_color="#4C566A"
+        )
+        self.terms_button.grid(row=4, column=1, padx=5, pady=5, sticky="w")
+
+        # Keep the results current after the search until Stop is pressed
+        self.watch_var = ctk.BooleanVar(value=False)
+        self.watch_checkbox = ctk.CTkCheckBox(
+            self.input_frame, text="Keep watching for changes", variable=self.watch_var, font=("Arial", 12)
+        )
+        self.watch_checkbox.grid(row=5, column=1, padx=5, pady=5, sticky="w")
+
         # Search Button
         self.search_button = ctk.CTkButton(
             self.input_frame, text="Search", command=self.start_search, font=("Arial", 14), fg_color="#5E81AC"
         )
-        self.search_button.grid(row=3, column=0, columnspan=2, pady=10)
+        self.search_button.grid(row=6, column=0, pady=10)
+
+        # Stop Button
+        self.stop_button = ctk.CTkButton(
+            self.input_frame, text="Stop", command=self.stop_search, font=("Arial", 14), fg_color="#BF616A",
+            state="disabled",
+        )
+        self.stop_button.grid(row=6, column=1, pady=10)
 
         # Output Frame
         self.output_frame = ctk.CTkFrame(self, fg_color="#3B4252")
@@ -231,12 +227,28 @@ class SearchApp(ctk.CTk):
         self.output_label = ctk.CTkLabel(self.output_frame, text="Result:", font=("Arial", 14))
         self.output_label.pack(pady=5)
 
-        # Scrollable Textbox for Results
-        self.output_text = ctk.CTkTextbox(self.output_frame, width=550, height=150, font=("Arial", 12), wrap="none")
-        self.output_text.pack(pady=5, fill="both", expand=True)
+        # Filter and sort the results without searching again
+        self.view_frame = ctk.CTkFrame(self.output_frame, fg_color="transparent")
+        self.view_frame.pack(fill="x", padx=5)
 
-        # Add a scrollbar to the textbox
-        self.output_text.configure(state="normal")  # Allow editing for inserting results
+        self.filter_entry = ctk.CTkEntry(
+            self.view_frame, placeholder_text="Filter results", width=300, font=("Arial", 12)
+        )
+        self.filter_entry.pack(side="left", fill="x", expand=True)
+        self.filter_entry.bind("<KeyRelease>", self.schedule_filter)
+        self.filter_job = None
+
+        self.sort_var = ctk.StringVar(value=FOUND_ORDER)
+        self.sort_dropdown = ctk.CTkOptionMenu(
+            self.view_frame, values=list(SORT_ORDERS), variable=self.sort_var, command=self.apply_view,
+            font=("Arial", 12), width=120,
+        )
+        self.sort_dropdown.pack(side="right", padx=(5, 0))
+
+        # Matches are kept in the store; the view only draws the rows on screen
+        self.result_store = ResultStore()
+        self.results_view = ResultsView(self.output_frame, self.result_store, fg_color="transparent")
+        self.results_view.pack(pady=5, fill="both", expand=True)
 
         # Loading Animation Label
         self.loading_label = ctk.CTkLabel(self.output_frame, text="", font=("Arial", 14))
@@ -248,12 +260,66 @@ class SearchApp(ctk.CTk):
         )
         self.clear_logs_button.pack(pady=10)
 
-        # Store the matched file paths
-        self.matched_file_paths = []
+        # Terms loaded from a file; when set they replace the search text
+        self.search_terms = []
+
+        # Matches travel from the search thread to the UI through this queue
+        self.result_queue = queue.Queue()
+        self.cancel_event = None
+        self.search_summary = ""
+        self.use_daemon = False
+
+        # Reuse extracted text between searches
+        configure_text_cache()
+        # Write the log files from a background thread
+        start_log_listener()
+
+        # Offer to continue a system-wide scan that was interrupted last time
+        self.after(0, self.offer_resume)
+
+    def offer_resume(self):
+        try:
+            journal = ScanJournal.resume(DEFAULT_JOURNAL_PATH)
+        except (OSError, ValueError):
+            return
+        if journal.finished:
+            journal.close()
+            return
+        search = journal.search
+        searched_for = search["search_text"] or f"{len(search['terms'])} terms"
+        if not messagebox.askyesno(
+            "Resume Scan",
+            f"The scan for {searched_for} in {', '.join(search['paths'])} was interrupted with "
+            f"{len(journal.done_directories)} directories searched. Continue it?",
+        ):
+            journal.close()
+            return
+        try:
+            workers = int(self.workers_var.get())
+        except ValueError:
+            workers = os.cpu_count() or 1
+        self.use_daemon = False
+        self.launch_search(
+            search["paths"], search["search_text"], search["terms"], search["file_extension"], workers, False, journal
+        )
+
+    def load_terms(self):
+        terms_file = filedialog.askopenfilename(title="Select Search Terms File", filetypes=[("Text files", "*.txt")])
+        if not terms_file:
+            # Cancelling the dialog goes back to searching for the entered text
+            self.search_terms = []
+            self.terms_button.configure(text="Load Terms...")
+            return
+        try:
+            self.search_terms = read_terms(terms_file)
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showwarning("Input Error", f"Could not read terms file: {e}")
+            return
+        self.terms_button.configure(text=f"{len(self.search_terms)} terms loaded")
 
     def start_search(self):
         search_text = self.search_entry.get().strip()
-        if not search_text or search_text.isspace():
+        if not self.search_terms and (not search_text or search_text.isspace()):
             messagebox.showwarning("Input Error", "Please enter valid text to search.")
             return
 
@@ -261,42 +327,207 @@ class SearchApp(ctk.CTk):
         if file_extension == "All Files":
             file_extension = None
 
+        try:
+            workers = int(self.workers_var.get())
+        except ValueError:
+            messagebox.showwarning("Input Error", "Worker processes must be a whole number.")
+            return
+
         selected_directory = self.directory_var.get()
-        if selected_directory == "All Directories":
+        system_wide = selected_directory == "All Directories"
+        if system_wide:
             search_paths = get_root_directories()
         else:
             search_paths = [selected_directory]
 
-        clear_log_files()  # Clear logs before starting a new search
-
-        self.output_text.delete("1.0", "end")  # Clear previous output
+        # A running search daemon has warm caches and workers; otherwise search here.
+        # Watching needs the local walker, so watched searches always run here.
+        from search_daemon import daemon_status
+
+        watch = self.watch_var.get()
+        self.use_daemon = not watch and daemon_status(DEFAULT_DAEMON_ADDRESS) is not None
+        journal = None
+        if not self.use_daemon:
+            clear_log_files()  # Clear logs before starting a new search
+            if system_wide:
+                # Record progress so an interrupted scan can be continued
+                journal = ScanJournal.create(
+                    DEFAULT_JOURNAL_PATH,
+                    {
+                        "search_text": None if self.search_terms else search_text,
+                        "terms": list(self.search_terms),
+                        "paths": search_paths,
+                        "file_extension": file_extension,
+                    },
+                )
+                search_paths = journal.search["paths"]
+        self.launch_search(search_paths, search_text, list(self.search_terms), file_extension, workers, watch, journal)
+
+    def launch_search(self, search_paths, search_text, search_terms, file_extension, workers, watch, journal=None):
+        # Clear previous output
+        self.result_store.clear()
+        self.results_view.show_message("")
+        self.output_label.configure(text="Result:")
+        self.result_queue = queue.Queue()
+
+        # Token checked by the search thread and the worker processes
+        self.cancel_event = create_cancel_event()
+        configure_cancel_event(self.cancel_event)
+        self.search_summary = ""
+        self.search_button.configure(state="disabled")
+        self.stop_button.configure(state="normal")
 
         # Start loading animation
         self.loading_label.configure(text="Searching...")
         self.update_loading_animation()
 
         # Run search in a separate thread to avoid freezing the UI
-        threading.Thread(target=self.perform_search, args=(search_paths, search_text, file_extension), daemon=True).start()
-
-    def perform_search(self, search_paths, search_text, file_extension):
-        matches = []
-        for path in search_paths:
-            matches.extend(search_files(path, search_text, file_extension))
-
-        # Stop loading animation and display results
-        self.after(0, self.display_results, matches)
+        if self.use_daemon:
+            target, args = self.perform_daemon_search, ()
+        else:
+            target, args = self.perform_search, (watch, journal)
+        threading.Thread(
+            target=target,
+            args=(search_paths, search_text, search_terms, file_extension, workers, self.result_queue) + args,
+            daemon=True,
+        ).start()
+        self.after(RESULT_POLL_MS, self.poll_results, self.result_queue)
+
+    def stop_search(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        if self.use_daemon:
+            from search_daemon import cancel_daemon_search
+
+            cancel_daemon_search(DEFAULT_DAEMON_ADDRESS)
+        self.stop_button.configure(state="disabled")
+        self.loading_label.configure(text="Stopping...")
+
+    def perform_search(
+        self, search_paths, search_text, search_terms, file_extension, workers, result_queue, watch=False, journal=None
+    ):
+        stats = SearchStats()
+        configure_search_stats(stats)
+        deduplicator = Deduplicator(get_text_cache())
+        executor = create_worker_pool(workers)
+        try:
+            matches = {}
+            if journal is not None:
+                # Matches found before the scan was interrupted
+                for match in journal.matches.values():
+                    matches[match[0] if search_terms else match] = match
+                    result_queue.put(match)
+            for match in iter_search(
+                search_paths, search_text, search_terms, file_extension, executor, journal=journal,
+                deduplicator=deduplicator,
+            ):
+                matches[match[0] if search_terms else match] = match
+                result_queue.put(match)
+            if journal is not None and not self.cancel_event.is_set():
+                journal.finish()
+            if watch and not self.cancel_event.is_set():
+                # The statistics cover the initial search, not the time spent waiting for changes
+                stats.finish()
+                configure_search_stats(None)
+                self.search_summary = stats.summary_line()
+                result_queue.put(WATCHING)
+                changes = watch_search(matches, search_paths, search_text, search_terms, file_extension, executor)
+                for change, match in changes:
+                    result_queue.put(match if change == "added" else (MATCH_REMOVED, match))
+        finally:
+            if journal is not None:
+                journal.close()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if get_text_cache() is not None:
+                get_text_cache().trim()
+            if stats.finished is None:
+                stats.finish()
+            self.search_summary = stats.summary_line()
+            if deduplicator.originals:
+                self.search_summary += f" {len(deduplicator.originals)} duplicate files were searched once."
+            result_queue.put(SEARCH_DONE)
+
+    # Same as perform_search, but the search daemon does the work
+    def perform_daemon_search(self, search_paths, search_text, search_terms, file_extension, workers, result_queue):
+        from search_daemon import daemon_search, match_from_result
+
+        try:
+            for result in daemon_search(DEFAULT_DAEMON_ADDRESS, search_paths, search_text, search_terms, file_extension):
+                if "summary" in result:
+                    self.search_summary = result["summary"]
+                else:
+                    result_queue.put(match_from_result(result))
+        except OSError as e:
+            self.search_summary = f"Search daemon error: {e}"
+        finally:
+            result_queue.put(SEARCH_DONE)
+
+    # Move the matches found since the last poll into the result store and redraw
+    # the rows on screen once
+    def poll_results(self, result_queue):
+        changed = False
+        done = False
+        for _ in range(MAX_RESULTS_PER_POLL):
+            try:
+                match = result_queue.get_nowait()
+            except queue.Empty:
+                break
+            if match is SEARCH_DONE:
+                done = True
+                break
+            if match is WATCHING:
+                self.loading_label.configure(text=f"{self.search_summary} Watching for changes...")
+                continue
+            if isinstance(match, tuple) and match[0] is MATCH_REMOVED:
+                self.result_store.remove(match[1][0] if isinstance(match[1], tuple) else match[1])
+            else:
+                # A watched file that matches different terms now updates its row
+                self.result_store.add(match)
+            changed = True
 
-    def display_results(self, matches):
-        self.loading_label.configure(text="")  # Stop loading animation
-        self.output_text.delete("1.0", "end")  # Clear previous output
+        if changed:
+            self.results_view.refresh()
+            self.update_result_count()
 
-        if matches:
-            self.output_text.insert("end", f"Found {len(matches)} matches:\n\n")
-            for match in matches:
-                # Insert each match as a clickable link in the textbox
-                self.output_text.insert("end", f"{match}\n")
+        if done:
+            self.display_results()
+        else:
+            self.after(RESULT_POLL_MS, self.poll_results, result_queue)
+
+    # Apply the filter once typing pauses
+    def schedule_filter(self, event=None):
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(FILTER_DELAY_MS, self.apply_view)
+
+    def apply_view(self, *args):
+        self.filter_job = None
+        self.result_store.set_view(self.filter_entry.get(), self.sort_var.get())
+        self.results_view.scroll_to(0)
+        self.update_result_count()
+
+    def update_result_count(self, prefix="Result:"):
+        shown = len(self.result_store.view())
+        total = len(self.result_store)
+        if shown == total:
+            self.output_label.configure(text=f"{prefix} {total} matches")
+        else:
+            self.output_label.configure(text=f"{prefix} {shown} of {total} matches shown")
+
+    def display_results(self):
+        stopped = self.cancel_event is not None and self.cancel_event.is_set()
+        # Stop loading animation and show the throughput of the search
+        summary = self.search_summary
+        self.loading_label.configure(text=f"Search stopped. {summary}" if stopped else summary)
+        self.search_button.configure(state="normal")
+        self.stop_button.configure(state="disabled")
+
+        if len(self.result_store):
+            self.update_result_count("Result: Found")
         else:
-            self.output_text.insert("end", "No matches found.")
+            self.output_label.configure(text="Result:")
+            self.results_view.show_message("No matches found.")
 
     def update_loading_animation(self):
         current_text = self.loading_label.cget("text")
@@ -309,5 +540,7 @@ class SearchApp(ctk.CTk):
 
 # Run the application
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = SearchApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
+    stop_log_listener()
\ No newline at end of file
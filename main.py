@@ -1,31 +1,105 @@
 import os
-import fitz  # PyMuPDF
+import signal
 import sys
 import fnmatch
 import logging
-from logging.handlers import RotatingFileHandler
-from docx import Document  # For .docx files
-from pptx import Presentation  # For .pptx files
-from openpyxl import load_workbook  # For .xlsx files
-import chardet
+import time
+import argparse
+import json
+import codecs
 import contextlib
+import functools
+import io
+import mmap
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ElementTree
+import multiprocessing
+import multiprocessing.util
+from collections import deque
+from concurrent.futures import CancelledError, Future
+from text_cache import (
+    DEFAULT_CACHE_PATH,
+    DEFAULT_CACHE_SIZE_MB,
+    configure_text_cache,
+    get_text_cache,
+    text_cache_settings,
+)
+from aho_corasick import create_term_matcher
+from archives import ARCHIVE_EXTENSIONS, ARCHIVE_SEPARATOR, DEFAULT_MAX_DEPTH, is_archive, iter_archive
+from trigram_index import DEFAULT_INDEX_DIR, TrigramIndex, index_exists, is_under_roots, text_trigrams
+from walker import Walker
+from search_stats import SearchStats, start_profiler
+from scan_journal import DEFAULT_JOURNAL_PATH, ScanJournal
+from dedup import Deduplicator
+from supervised_pool import PipeLogQueue, SupervisedPool, WorkerKilled
 
-# Configure logging for successful file paths
+# Format backends (PyMuPDF, openpyxl, chardet) and the log files are only set up
+# when they are first needed, so a search of .txt files or a --help never loads them.
+
+# Logging for successful file paths
 success_logger = logging.getLogger("success_logger")
 success_logger.setLevel(logging.INFO)
-success_handler = RotatingFileHandler("success.log", encoding="utf-8")
-success_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
-success_logger.addHandler(success_handler)
+success_logger.addHandler(logging.NullHandler())
 
-# Configure logging for unsuccessful file paths
+# Logging for unsuccessful file paths
 unsuccessful_logger = logging.getLogger("unsuccessful_logger")
 unsuccessful_logger.setLevel(logging.WARNING)
-unsuccessful_handler = RotatingFileHandler("unsuccessful.log", encoding="utf-8")
-unsuccessful_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
-unsuccessful_logger.addHandler(unsuccessful_handler)
+unsuccessful_logger.addHandler(logging.NullHandler())
 
 # Store handlers in a list for later access
-log_handlers = [success_handler, unsuccessful_handler]
+log_handlers = []
+
+# Create the log file handlers. Called when the CLI or the GUI starts; until then
+# log records are dropped.
+def setup_logging():
+    from logging.handlers import RotatingFileHandler
+
+    if log_handlers:
+        return
+    for logger, log_file in ((success_logger, "success.log"), (unsuccessful_logger, "unsuccessful.log")):
+        handler = RotatingFileHandler(log_file, encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+        # Each file handler only writes its own logger's records once both share the queue
+        handler.addFilter(logging.Filter(logger.name))
+        logger.addHandler(handler)
+        log_handlers.append(handler)
+
+# Queue carrying log records from the search to the log files. Worker processes
+# send theirs to the main process over their own pipes (see PipeLogQueue).
+log_queue = None
+log_listener = None
+
+# Write the log files on a background thread so file I/O stays off the search path
+def start_log_listener():
+    from logging.handlers import QueueListener
+
+    global log_queue, log_listener
+    if log_listener is not None:
+        return
+    setup_logging()
+    log_queue = multiprocessing.get_context("spawn").Queue()
+    log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+    log_listener.start()
+    use_log_queue(log_queue)
+
+# Flush the queued records to the log files and stop the background writer
+def stop_log_listener():
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+# Send this process's log records to the queue instead of the files
+def use_log_queue(queue):
+    from logging.handlers import QueueHandler
+
+    for logger in (success_logger, unsuccessful_logger):
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            if handler not in log_handlers or queue is not log_queue:
+                handler.close()
+        logger.addHandler(QueueHandler(queue))
 
 def clear_log_files():
     log_files = ["success.log", "unsuccessful.log"]
@@ -39,106 +113,772 @@ def clear_log_files():
         if os.path.exists(log_file):
             os.remove(log_file)
 
-# Extract text from .pdf file
-def extract_text_from_pdf(pdf_path):
+# The extract_text_from_* functions are generators that yield the text of a
+# file chunk by chunk (PDF page, paragraph, shape, row) so a search can stop
+# at the first match. They raise if the file cannot be read. The optional
+# search_text lets an extractor skip content that cannot contain it; it is
+# only passed when the text is not going to be cached.
+
+# Size of the chunks read from .txt files
+TXT_CHUNK_SIZE = 1024 * 1024
+
+# Large PDFs are split into ranges of this many pages that separate workers extract
+PDF_PAGES_PER_TASK = 200
+
+# Only PDFs at least this big are opened in the main process to count their pages
+PDF_SPLIT_MIN_BYTES = 2 * 1024 * 1024
+
+# Search PDFs with MuPDF's own page search instead of extracting their text
+pdf_native_search = False
+
+# Archive members larger than this are skipped unless configured otherwise
+DEFAULT_MEMBER_SIZE_MB = 256
+
+# Per-file limits set with configure_limits; None means no limit.
+#   file_size      bytes, by file type; the None key applies to the other types
+#   pages          pages of a PDF or slides of a presentation
+#   rows           rows of a workbook, over all its sheets
+#   timeout        seconds a worker process may spend on one file
+#   memory         bytes of resident memory a worker process may use
+#   member_size    bytes of a single archive member, after decompression
+#   archive_depth  levels of nested archives that are opened (0 skips archives)
+file_limits = {
+    "file_size": {}, "pages": None, "rows": None, "timeout": None, "memory": None,
+    "member_size": DEFAULT_MEMBER_SIZE_MB * 1024 * 1024, "archive_depth": DEFAULT_MAX_DEPTH,
+}
+
+# Raised for a file over one of the limits. Unlike other failures it is not
+# cached, so the file is searched again once the limit is raised.
+class FileLimitExceeded(ValueError):
+    pass
+
+# Set the per-file limits for this process
+def configure_limits(
+    file_size=None, pages=None, rows=None, timeout=None, memory=None,
+    member_size=DEFAULT_MEMBER_SIZE_MB * 1024 * 1024, archive_depth=DEFAULT_MAX_DEPTH,
+):
+    global file_limits
+    file_limits = {
+        "file_size": dict(file_size or {}), "pages": pages, "rows": rows, "timeout": timeout, "memory": memory,
+        "member_size": member_size, "archive_depth": archive_depth,
+    }
+
+def check_page_limit(page_count, file_path):
+    if file_limits["pages"] is not None and page_count > file_limits["pages"]:
+        raise FileLimitExceeded(f"{file_path} has {page_count} pages, over the limit of {file_limits['pages']}")
+
+# Extractors take a file path or an archive member (a binary file object that
+# formats as its path inside the archive)
+
+# Open a path for binary reading, or rewind an archive member
+def open_binary(source):
+    if isinstance(source, str):
+        return open(source, "rb")
+    source.seek(0)
+    return contextlib.nullcontext(source)
+
+def source_size(source):
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return source.size
+
+# Import PyMuPDF the first time a PDF is opened.
+# MuPDF reports problems through its own warning store instead of stderr.
+# This only affects MuPDF, unlike redirecting sys.stderr for every thread.
+@functools.lru_cache(maxsize=None)
+def load_fitz():
+    import fitz  # PyMuPDF
+
+    fitz.TOOLS.mupdf_display_errors(False)
+    return fitz
+
+# Raise if no page of a PDF uses a font, i.e. it is scanned or image-only
+def check_pdf_text_layer(doc, pdf_path):
+    for page_number in range(doc.page_count):
+        if doc.get_page_fonts(page_number):
+            return
+    raise ValueError(f"PDF {pdf_path} has no text layer (scanned or image-only)")
+
+def _log_mupdf_warnings(pdf_path):
+    warnings = load_fitz().TOOLS.mupdf_warnings()
+    if warnings:
+        unsuccessful_logger.warning(f"Unsuccessful: {pdf_path} - MuPDF warnings: {warnings}")
+
+def open_pdf(source):
+    fitz = load_fitz()
+    if isinstance(source, str):
+        return fitz.open(source)
+    source.seek(0)
+    return fitz.open(stream=source.read(), filetype="pdf")
+
+# Extract text from .pdf file (optionally only the pages in page_range)
+def extract_text_from_pdf(pdf_path, search_text=None, page_range=None):
+    load_fitz().TOOLS.mupdf_warnings()  # Reset the warning store
+    with open_pdf(pdf_path) as doc:
+        if page_range is None:
+            check_page_limit(doc.page_count, pdf_path)
+            check_pdf_text_layer(doc, pdf_path)
+            page_range = (0, doc.page_count)
+        for page_number in range(*page_range):
+            try:
+                yield doc[page_number].get_text("text") + "\n"
+            except Exception as page_error:
+                error_message = f"Error extracting text from page in PDF {pdf_path}: {page_error}"
+                unsuccessful_logger.warning(f"Unsuccessful: {pdf_path} - {error_message}")
+    _log_mupdf_warnings(pdf_path)
+
+# Search a PDF with MuPDF's page search, which finds text without building Python
+# strings. It ignores case, so hits are confirmed on that page's extracted text.
+def search_pdf_native(pdf_path, search_text):
+    fitz = load_fitz()
+    fitz.TOOLS.mupdf_warnings()  # Reset the warning store
+    with fitz.open(pdf_path) as doc:
+        check_page_limit(doc.page_count, pdf_path)
+        check_pdf_text_layer(doc, pdf_path)
+        for page in doc:
+            if page.search_for(search_text) and search_text in page.get_text("text"):
+                return True
+    _log_mupdf_warnings(pdf_path)
+    return False
+
+# Page ranges to spread a large PDF over the worker pool, or None to keep it in one task.
+# Raises like checked_file_type for files that are over their size limit or not a PDF.
+def pdf_page_ranges(pdf_path):
+    # The timeout applies to each task, so a split PDF could run for several timeouts
+    if file_limits["timeout"] is not None:
+        return None
+    stat = os.stat(pdf_path)
+    if stat.st_size < PDF_SPLIT_MIN_BYTES:
+        return None
+    cache = get_text_cache()
+    if cache is not None and cache.contains(pdf_path, stat):
+        return None  # Already cached: one task reads it back
+    if checked_file_type(pdf_path) != ".pdf":
+        return None
+    with load_fitz().open(pdf_path) as doc:
+        check_page_limit(doc.page_count, pdf_path)
+        check_pdf_text_layer(doc, pdf_path)
+        page_count = doc.page_count
+    if page_count <= PDF_PAGES_PER_TASK:
+        return None
+    return [(start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+
+# Extract the text of a range of PDF pages (one task of a split PDF)
+def extract_pdf_pages(pdf_path, start, stop):
+    return "".join(extract_text_from_pdf(pdf_path, page_range=(start, stop)))
+
+# Enable or disable native PDF search for this process
+def configure_pdf_search(native_search):
+    global pdf_native_search
+    pdf_native_search = native_search
+
+# Byte order marks, longest first since the UTF-32 LE mark starts with the UTF-16 LE one
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+# Bytes sampled to detect the encoding of a .txt file
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# Share of the characters of UTF-16 or UTF-32 text without a byte order mark
+# that must be below U+0100 for it to be recognized
+WIDE_TEXT_SHARE = 0.5
+
+# The encoding of UTF-16 or UTF-32 text without a byte order mark, recognized by
+# where its zero bytes fall: characters below U+0100, as in most Western text,
+# have zero high bytes and a non-zero low byte, while binary data has its zero
+# bytes anywhere. Returns None if the zero bytes are not in such a pattern.
+def wide_text_encoding(sample):
+    units = len(sample) // 4
+    if units < 2:
+        return None
+    # Zero bytes at each offset of the 4-byte groups
+    zeros = [sample[offset:units * 4:4].count(0) for offset in range(4)]
+    most = units * WIDE_TEXT_SHARE
+    few = units // 100  # NUL characters are rare in text
+    # The highest byte of UTF-32 is always zero, and the next nearly always
+    if zeros[3] == units and zeros[2] >= most and zeros[0] <= few:
+        return "utf-32-le"
+    if zeros[0] == units and zeros[1] >= most and zeros[3] <= few:
+        return "utf-32-be"
+    if zeros[1] + zeros[3] >= 2 * most and zeros[0] + zeros[2] <= 2 * few:
+        return "utf-16-le"
+    if zeros[0] + zeros[2] >= 2 * most and zeros[1] + zeros[3] <= 2 * few:
+        return "utf-16-be"
+    return None
+
+# Detect the encoding of a .txt file from a sample of its first bytes.
+# Returns the encoding and the length of the byte order mark to skip.
+def detect_encoding(raw_data):
+    for bom, encoding in BOMS:
+        if raw_data.startswith(bom):
+            return encoding, len(bom)
+
+    if b"\x00" in raw_data:
+        # NUL bytes are valid UTF-8, so UTF-16 and UTF-32 are recognized first
+        encoding = wide_text_encoding(raw_data)
+        if encoding is not None:
+            return encoding, 0
+    elif b"\x1b" not in raw_data and b"~{" not in raw_data:
+        # Most files are ASCII or UTF-8, which is cheap to validate and needs no chardet.
+        # ISO-2022 (escape sequences) and HZ (~{) are 7-bit too, so they go to chardet.
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(raw_data, final=False)
+            return "utf-8", 0
+        except UnicodeDecodeError:
+            pass
+
+    import chardet
+
+    detected = chardet.detect(raw_data[:1000])  # Read a sample of the file to detect encoding
+    return (detected["encoding"] or "utf-8").lower(), 0
+
+# Encodings that switch character sets with escape sequences, where the same
+# bytes mean different characters depending on what came before
+STATEFUL_ENCODINGS = ("iso-2022", "iso2022", "hz")
+
+# True if every byte of the encoding is one character, so a byte match is a text match
+@functools.lru_cache(maxsize=None)
+def is_single_byte_encoding(encoding):
+    if encoding.startswith(STATEFUL_ENCODINGS):
+        return False
     try:
-        text = ""
-        # Redirect stderr to capture MuPDF errors
-        with contextlib.redirect_stderr(sys.stdout):  # Temporarily redirect stderr
-            doc = fitz.open(pdf_path)
+        return len(bytes(range(256)).decode(encoding, errors="replace")) == 256 and len("A".encode(encoding)) == 1
+    except LookupError:
+        return False
 
-            for page in doc:
-                try:
-                    text += page.get_text("text") + "\n"
-                except Exception as page_error:
-                    error_message = f"Error extracting text from page in PDF {pdf_path}: {page_error}"
-                    unsuccessful_logger.warning(f"Unsuccessful: {pdf_path} - {error_message}")
+# Search the raw bytes of a .txt file without decoding it.
+# Returns None when the encoding does not allow a byte search.
+def search_text_file_bytes(file_path, search_text):
+    with open(file_path, "rb") as f:
+        encoding, bom_length = detect_encoding(f.read(ENCODING_SAMPLE_SIZE))
+        if encoding.startswith(("utf-16", "utf-32")):
+            if encoding not in ("utf-16-le", "utf-16-be", "utf-32-le", "utf-32-be"):
+                return None  # Byte order unknown without a byte order mark
+            unit = 2 if encoding.startswith("utf-16") else 4
+        elif encoding in ("utf-8", "ascii") or is_single_byte_encoding(encoding):
+            # UTF-8 is self-synchronizing, so a byte match always starts on a character
+            unit = 1
+        else:
+            return None  # Multi-byte encodings such as Shift_JIS can match mid-character
 
-        success_logger.info(f"Successfully processed: {pdf_path}")
-        return text.strip()
-    except Exception as e:
-        error_message = f"Error opening or processing PDF {pdf_path}: {e}"
-        unsuccessful_logger.warning(f"Unsuccessful: {pdf_path} - {error_message}")
-        return ""
+        try:
+            needle = search_text.encode(encoding)
+        except UnicodeEncodeError:
+            return None
+
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position = data.find(needle, bom_length)
+            # UTF-16/32 matches only count when aligned to a code unit
+            while position != -1 and (position - bom_length) % unit:
+                position = data.find(needle, position + 1)
+            return position != -1
 
 # Extract text from .txt file
-def extract_text_from_txt(file_path):
-    try:
+def extract_text_from_txt(file_path, search_text=None):
+    with open_binary(file_path) as f:
         # Detect file encoding
-        with open(file_path, "rb") as f:
-            raw_data = f.read(1000)  # Read a sample of the file to detect encoding
-            detected = chardet.detect(raw_data)
-            encoding = detected["encoding"] if detected["encoding"] else "utf-8"
+        encoding, bom_length = detect_encoding(f.read(ENCODING_SAMPLE_SIZE))
+        f.seek(bom_length)  # Skip the byte order mark
 
         # Read file using detected encoding
-        with open(file_path, "r", encoding=encoding, errors="replace") as file:
-            text = file.read().strip()
-            success_logger.info(f"Successfully processed: {file_path}")
-            return text
-    except Exception as e:
-        error_message = f"Error reading .txt file {file_path}: {e}"
-        unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
+        file = io.TextIOWrapper(f, encoding=encoding, errors="replace")
+        try:
+            while True:
+                chunk = file.read(TXT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            file.detach()  # Leave closing to the binary file
+
+# Local name of an XML tag, ignoring the transitional or strict OOXML namespace
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+# Read a .rels part and map relationship ids to (target part name, relationship type)
+def _read_relationships(archive, part_name):
+    directory, name = posixpath.split(part_name)
+    rels_name = posixpath.join(directory, "_rels", name + ".rels")
+    if rels_name not in archive.NameToInfo:
+        return {}
+    relationships = {}
+    for element in ElementTree.fromstring(archive.read(rels_name)):
+        target = element.get("Target", "")
+        if element.get("TargetMode") == "External":
+            continue
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(directory, target))
+        relationships[element.get("Id")] = (target, element.get("Type", ""))
+    return relationships
+
+# The part a relationship id attribute (r:id) of an element points to
+def _relationship_target(element, relationships):
+    # r:id, not the plain id attribute that slide ids also carry
+    relationship_id = next((v for k, v in element.attrib.items() if k.startswith("{") and _local_name(k) == "id"), None)
+    return relationships.get(relationship_id, (None, ""))
+
+# Name of the main part of an OOXML package (word/document.xml, ppt/presentation.xml, ...)
+def _main_part(archive, default):
+    for target, kind in _read_relationships(archive, "").values():
+        if kind.endswith("/officeDocument") and target in archive.NameToInfo:
+            return target
+    return default
+
+# Yield the text of every paragraph of an OOXML part with an incremental parser.
+# w:t and a:t runs are joined per paragraph (w:p or a:p); tabs and breaks are kept.
+# Paragraphs nested in text boxes are yielded on their own.
+def _ooxml_paragraphs(archive, part_name):
+    with archive.open(part_name) as source:
+        elements = []
+        paragraphs = []
+        for event, element in ElementTree.iterparse(source, events=("start", "end")):
+            name = _local_name(element.tag)
+            if event == "start":
+                elements.append(element)
+                if name == "p":
+                    paragraphs.append([])
+                continue
+
+            elements.pop()
+            if name == "t" and paragraphs and _local_name(elements[-1].tag) != "rPh":
+                paragraphs[-1].append(element.text or "")
+            elif name == "tab" and paragraphs and _local_name(elements[-1].tag) == "r":
+                paragraphs[-1].append("\t")
+            elif name in ("br", "cr") and paragraphs:
+                paragraphs[-1].append("\n")
+            elif name == "p" and paragraphs:
+                yield "".join(paragraphs.pop()) + "\n"
+                # Drop parsed paragraphs so the tree never grows
+                if elements and len(elements[-1]) and elements[-1][-1] is element:
+                    del elements[-1][-1]
+
+# Extract text from .docx file.
+# Reads the body, headers, footers, footnotes and endnotes straight from the
+# package XML, which also covers text in tables and text boxes.
+def extract_text_from_docx(file_path, search_text=None):
+    with zipfile.ZipFile(file_path) as archive:
+        document_part = _main_part(archive, "word/document.xml")
+        yield from _ooxml_paragraphs(archive, document_part)
+        part_kinds = ["header", "footer", "footnotes", "endnotes"]
+        related_parts = [
+            (part_kinds.index(kind.rsplit("/", 1)[-1]), target)
+            for target, kind in _read_relationships(archive, document_part).values()
+            if kind.rsplit("/", 1)[-1] in part_kinds and target in archive.NameToInfo
+        ]
+        for _, part_name in sorted(related_parts):
+            yield from _ooxml_paragraphs(archive, part_name)
+
+# Extract text from .pptx file.
+# Reads every slide in presentation order, including grouped shapes and
+# tables, followed by its speaker notes.
+def extract_text_from_pptx(file_path, search_text=None):
+    with zipfile.ZipFile(file_path) as archive:
+        presentation_part = _main_part(archive, "ppt/presentation.xml")
+        relationships = _read_relationships(archive, presentation_part)
+        presentation = ElementTree.fromstring(archive.read(presentation_part))
+        slide_ids = [element for element in presentation.iter() if _local_name(element.tag) == "sldId"]
+        check_page_limit(len(slide_ids), file_path)
+        for element in slide_ids:
+            slide_part, _ = _relationship_target(element, relationships)
+            if slide_part not in archive.NameToInfo:
+                continue
+            yield from _ooxml_paragraphs(archive, slide_part)
+            for target, kind in _read_relationships(archive, slide_part).values():
+                if kind.endswith("/notesSlide") and target in archive.NameToInfo:
+                    yield from _ooxml_paragraphs(archive, target)
+
+# Paths of the worksheets of a workbook, in workbook order
+def _xlsx_sheet_paths(archive):
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+
+    workbook_part = _main_part(archive, "xl/workbook.xml")
+    relationships = _read_relationships(archive, workbook_part)
+    workbook = ElementTree.fromstring(archive.read(workbook_part))
+    sheet_paths = []
+    date1904 = False
+    for element in workbook.iter():
+        name = _local_name(element.tag)
+        if name == "workbookPr":
+            date1904 = element.get("date1904") in ("1", "true")
+        elif name == "sheet":
+            target, kind = _relationship_target(element, relationships)
+            # Chartsheets and dialog sheets hold no cells
+            if target and kind.endswith("/worksheet") and target in archive.NameToInfo:
+                sheet_paths.append(target)
+    return sheet_paths, CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+# Style ids whose number format displays a date, and those that display a duration
+def _xlsx_date_styles(archive):
+    from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+
+    if "xl/styles.xml" not in archive.NameToInfo:
+        return set(), set()
+    styles = ElementTree.fromstring(archive.read("xl/styles.xml"))
+    formats = dict(BUILTIN_FORMATS)
+    date_styles, timedelta_styles = set(), set()
+    for element in styles.iter():
+        if _local_name(element.tag) == "numFmt":
+            formats[int(element.get("numFmtId"))] = element.get("formatCode", "")
+    for element in styles:
+        if _local_name(element.tag) == "cellXfs":
+            for style_id, xf in enumerate(element):
+                number_format = formats.get(int(xf.get("numFmtId", 0)), "")
+                if is_date_format(number_format):
+                    date_styles.add(style_id)
+                if is_timedelta_format(number_format):
+                    timedelta_styles.add(style_id)
+    return date_styles, timedelta_styles
+
+# Characters of numbers, dates and times as cells render them, including
+# timedeltas ("-1 days, 2:00:00") and dates out of range ("#VALUE!")
+NUMBER_CHARACTERS = frozenset("0123456789.-+eE: days,#VALUE!")
+
+# True if the needle could match text that includes a rendered number. A match
+# inside a number only has NUMBER_CHARACTERS, and a match that runs into a number
+# from the text around it has a digit, or else ends with the start of "-1" or
+# "#VALUE!" or starts with the end of "#VALUE!".
+def can_match_number(search_text):
+    if set(search_text) <= NUMBER_CHARACTERS or any(char.isdigit() for char in search_text):
+        return True
+    if search_text.endswith("-"):
+        return True
+    return any(
+        search_text.endswith("#VALUE!"[:length]) or search_text.startswith("#VALUE!"[-length:])
+        for length in range(1, len("#VALUE!") + 1)
+    )
+
+# Extract text from .xlsx file.
+# Reads the worksheet XML incrementally instead of building the openpyxl object
+# model, so memory stays flat however large the workbook is. Cell values are
+# rendered the way openpyxl's load_workbook shows them (formulas as "=...").
+def extract_text_from_xlsx(file_path, search_text=None):
+    from openpyxl.reader.strings import read_string_table
+
+    # Numeric cells that the needle cannot match are replaced by a separator
+    # instead of being converted
+    skip_numbers = search_text is not None and not can_match_number(search_text)
+    with zipfile.ZipFile(file_path) as archive:
+        shared_strings = []
+        if "xl/sharedStrings.xml" in archive.NameToInfo:
+            with archive.open("xl/sharedStrings.xml") as source:
+                shared_strings = read_string_table(source)
+        sheet_paths, epoch = _xlsx_sheet_paths(archive)
+        date_styles, timedelta_styles = _xlsx_date_styles(archive)
+
+        max_rows = file_limits["rows"]
+        row_count = 0
+        for sheet_path in sheet_paths:
+            shared_formulas = {}
+            with archive.open(sheet_path) as source:
+                sheet_data = None
+                for event, element in ElementTree.iterparse(source, events=("start", "end")):
+                    name = _local_name(element.tag)
+                    if event == "start":
+                        if name == "sheetData":
+                            sheet_data = element
+                        continue
+                    if name != "row":
+                        continue
+                    row_count += 1
+                    if max_rows is not None and row_count > max_rows:
+                        raise FileLimitExceeded(f"{file_path} has more than {max_rows} rows")
+                    values = []
+                    for cell in element:
+                        value = _xlsx_cell_text(
+                            cell, shared_strings, shared_formulas, date_styles, timedelta_styles, epoch, skip_numbers
+                        )
+                        if value:
+                            values.append(value)
+                    yield " ".join(values) + "\n"
+                    # Drop parsed rows so the tree never grows
+                    if sheet_data is not None:
+                        sheet_data.clear()
+
+# Render one <c> element as text, or "" for empty and falsy cells
+def _xlsx_cell_text(cell, shared_strings, shared_formulas, date_styles, timedelta_styles, epoch, skip_numbers):
+    data_type = cell.get("t", "n")
+    value = None
+    formula = None
+    inline = None
+    for child in cell:
+        name = _local_name(child.tag)
+        if name == "v":
+            value = child.text
+        elif name == "f":
+            formula = child
+        elif name == "is":
+            inline = child
+
+    if formula is not None:
+        text = "=" + (formula.text or "")
+        if formula.get("t") == "shared":
+            index = formula.get("si")
+            if index in shared_formulas:
+                return shared_formulas[index].translate_formula(cell.get("r"))
+            if text != "=":
+                from openpyxl.formula.translate import Translator
+
+                shared_formulas[index] = Translator(text, cell.get("r"))
+        elif formula.get("t") == "dataTable":
+            return ""
+        return text
+
+    if data_type == "inlineStr":
+        if inline is None:
+            return ""
+        # Plain and rich text runs, but not phonetic hints
+        texts = []
+        for child in inline:
+            name = _local_name(child.tag)
+            if name == "t":
+                texts.append(child.text or "")
+            elif name == "r":
+                texts.extend(run.text or "" for run in child if _local_name(run.tag) == "t")
+        return "".join(texts)
+    if not value:
         return ""
+    if data_type == "s":
+        return shared_strings[int(value)]
+    if data_type == "str" or data_type == "e":
+        return value
+    if data_type == "b":
+        return "True" if int(value) else ""
+    if data_type == "d":
+        if skip_numbers:
+            return "\x00"
+        from openpyxl.utils.datetime import from_ISO8601
 
-# Extract text from .docx file
-def extract_text_from_docx(file_path):
-    try:
-        doc = Document(file_path)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        success_logger.info(f"Successfully processed: {file_path}")
-        return text.strip()
-    except Exception as e:
-        error_message = f"Error reading .docx file {file_path}: {e}"
-        unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
+        return str(from_ISO8601(value))
+
+    number = float(value) if "." in value or "E" in value or "e" in value else int(value)
+    style_id = int(cell.get("s", 0))
+    # Like load_workbook, zero is an empty cell, except in a date or time cell,
+    # where it reads as midnight; a zero duration is still empty
+    if not number and (style_id not in date_styles or style_id in timedelta_styles):
         return ""
+    if skip_numbers:
+        return "\x00"
+    if style_id in date_styles:
+        from openpyxl.utils.datetime import from_excel
+
+        try:
+            return str(from_excel(number, epoch, timedelta=style_id in timedelta_styles))
+        except (OverflowError, ValueError):
+            return "#VALUE!"
+    return str(number)
+
+# Raised inside extraction when the search has been stopped. It derives from
+# BaseException so the per-file error handlers do not log it as a failed file.
+class SearchCancelled(BaseException):
+    pass
+
+# Cancellation token of the running search, shared with the worker processes
+cancel_event = None
+
+# Create a cancellation token that threads and worker processes can both check
+def create_cancel_event():
+    return multiprocessing.get_context("spawn").Event()
+
+# Set the cancellation token checked by extraction in this process
+def configure_cancel_event(event):
+    global cancel_event
+    cancel_event = event
+
+# Chunks produced by the extractors for the file being processed, for the stats
+chunk_count = 0
+
+# Pass chunks through, counting them and stopping between chunks once the
+# search is cancelled
+def cancellable(chunks):
+    global chunk_count
+    for chunk in chunks:
+        if cancel_event is not None and cancel_event.is_set():
+            raise SearchCancelled()
+        chunk_count += 1
+        yield chunk
 
-# Extract text from .pptx file
-def extract_text_from_pptx(file_path):
+# Check the chunks of a document for the text, stopping at the first match.
+# The last len(search_text) - 1 characters are carried over to the next chunk
+# so matches that span a chunk boundary are found too.
+def text_in_chunks(chunks, search_text):
+    keep = len(search_text) - 1
+    carry = ""
+    for chunk in chunks:
+        window = carry + chunk
+        if search_text in window:
+            return True
+        carry = window[-keep:] if keep else ""
+    return False
+
+# Read the whole text of a file, or None if it cannot be read
+def read_text(file_path, extractor):
     try:
-        ppt = Presentation(file_path)
-        text = ""
-        for slide in ppt.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        success_logger.info(f"Successfully processed: {file_path}")
-        return text.strip()
+        text = "".join(cancellable(extractor(file_path))).strip()
+    except FileLimitExceeded:
+        raise  # Not cached as a failure: the caller logs it
     except Exception as e:
-        error_message = f"Error reading .pptx file {file_path}: {e}"
+        error_message = f"Error extracting text from {file_path}: {e}"
         unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
-        return ""
+        return None
+    success_logger.info(f"Successfully processed: {file_path}")
+    return text
 
-# Extract text from .xlsx file
-def extract_text_from_xlsx(file_path):
+# Stream a file through a matcher without building its full text.
+# The matcher receives the chunk iterator; returns None if the file cannot be read.
+def stream_search(file_path, extractor, matcher, search_text=None):
+    chunks = extractor(file_path, search_text)
     try:
-        workbook = load_workbook(file_path)
-        text = ""
-        for sheet in workbook:
-            for row in sheet.iter_rows(values_only=True):
-                row_text = " ".join(str(cell) for cell in row if cell)
-                text += row_text + "\n"
-        success_logger.info(f"Successfully processed: {file_path}")
-        return text.strip()
+        result = matcher(cancellable(chunks))
     except Exception as e:
-        error_message = f"Error reading .xlsx file {file_path}: {e}"
+        error_message = f"Error extracting text from {file_path}: {e}"
         unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
-        return ""
+        return None
+    finally:
+        # Stop parsing and release the document as soon as the match is known
+        chunks.close()
+    success_logger.info(f"Successfully processed: {file_path}")
+    return result
+
+# Map file extensions to their text extractors
+EXTRACTORS = {
+    ".pdf": extract_text_from_pdf,
+    ".txt": extract_text_from_txt,
+    ".docx": extract_text_from_docx,
+    ".pptx": extract_text_from_pptx,
+    ".xlsx": extract_text_from_xlsx,
+}
+
+SUPPORTED_EXTENSIONS = tuple(EXTRACTORS)
 
-# Search for text in a file
-def search_text_in_file(file_path, search_text):
-    try:
-        if file_path.endswith(".pdf"):
-            text = extract_text_from_pdf(file_path)
-        elif file_path.endswith(".txt"):
-            text = extract_text_from_txt(file_path)
-        elif file_path.endswith(".docx"):
-            text = extract_text_from_docx(file_path)
-        elif file_path.endswith(".pptx"):
-            text = extract_text_from_pptx(file_path)
-        elif file_path.endswith(".xlsx"):
-            text = extract_text_from_xlsx(file_path)
+# Bytes read from the start of a file to recognize its type
+SNIFF_SIZE = 1024
+
+# Folder of the main part of each OOXML document type
+OOXML_FOLDERS = {"word/": ".docx", "ppt/": ".pptx", "xl/": ".xlsx"}
+
+# Recognize a file's real type from its content, whatever its name: one of the
+# EXTRACTORS extensions, or None for binaries and other formats
+def sniff_file_type(file_path):
+    with open_binary(file_path) as f:
+        head = f.read(SNIFF_SIZE)
+    # PDF readers accept some junk before the header
+    if head.startswith(b"%PDF-") or (str(file_path).endswith(".pdf") and b"%PDF-" in head):
+        return ".pdf"
+    if head.startswith(b"PK\x03\x04"):
+        with zipfile.ZipFile(file_path) as archive:
+            for name in archive.NameToInfo:
+                for folder, file_type in OOXML_FOLDERS.items():
+                    if name.startswith(folder):
+                        return file_type
+        return None
+    # Text has no NUL bytes, unless it is UTF-16 or UTF-32
+    if b"\x00" not in head or any(head.startswith(bom) for bom, _ in BOMS) or wide_text_encoding(head):
+        return ".txt"
+    # UTF-16 or UTF-32 with many characters above U+00FF
+    import chardet
+
+    encoding = chardet.detect(head)["encoding"] or ""
+    return ".txt" if encoding.lower().startswith(("utf-16", "utf-32")) else None
+
+# Return a file's real type, raising ValueError for unsupported content and
+# FileLimitExceeded if the file is over the size limit for its type
+def checked_file_type(file_path):
+    file_type = sniff_file_type(file_path)
+    if file_type is None:
+        raise ValueError(f"{file_path} is not a text file or a supported document (binary or unrecognized content)")
+    size_limits = file_limits["file_size"]
+    limit = size_limits.get(file_type, size_limits.get(None))
+    if limit is not None:
+        size = source_size(file_path)
+        if size > limit:
+            raise FileLimitExceeded(
+                f"{file_path} is {size / (1024 * 1024):.1f} MB, over the {file_type} limit of {limit // (1024 * 1024)} MB"
+            )
+    return file_type
+
+# Extract the text of a file with the extractor for its real type
+def extract_text_from_file(file_path, search_text=None):
+    yield from EXTRACTORS[checked_file_type(file_path)](file_path, search_text)
+
+# Pick the extractor for a file, or None for unsupported file types.
+# The extension only decides which files are searched; each file is then read
+# according to its content.
+def get_extractor(file_path):
+    if file_path.endswith(SUPPORTED_EXTENSIONS):
+        return extract_text_from_file
+    return None
+
+# Extract text from a file, reusing the cached text if the file is unchanged.
+# text is the already extracted text of a PDF that was split across workers.
+def extract_text(file_path, extractor, text=None):
+    cache = get_text_cache()
+    if text is not None:
+        text = text.strip()
+        success_logger.info(f"Successfully processed: {file_path}")
+        if cache is not None:
+            cache.put(file_path, os.stat(file_path), text)
+        return text
+    if cache is None:
+        return read_text(file_path, extractor)
+
+    stat = os.stat(file_path)
+    hit, text = cache.get(file_path, stat)
+    if hit:
+        if text is None:
+            unsuccessful_logger.warning(f"Unsuccessful: {file_path} - failed in an earlier search (cached)")
         else:
+            success_logger.info(f"Successfully processed (cached): {file_path}")
+        return text
+
+    text = read_text(file_path, extractor)
+    cache.put(file_path, stat, text)
+    return text
+
+# Search for text in a file (text is only given for PDFs split across workers)
+def search_text_in_file(file_path, search_text, text=None):
+    try:
+        extractor = get_extractor(file_path)
+        if extractor is None:
             return False  # Skip unsupported file types
+        if text is not None:
+            return search_text in extract_text(file_path, extractor, text)
+
+        def matcher(chunks):
+            return text_in_chunks(chunks, search_text)
+
+        if file_path.endswith(".txt") or get_text_cache() is None:
+            file_type = checked_file_type(file_path)
+            extractor = EXTRACTORS[file_type]
+
+            # Plain text is searched in place, which is faster than caching its text
+            if file_type == ".txt":
+                found = search_text_file_bytes(file_path, search_text)
+                if found is not None:
+                    success_logger.info(f"Successfully processed: {file_path}")
+                    return found
+                return bool(stream_search(file_path, extractor, matcher, search_text))
+
+            # Without the cache there is no need for the full text, so stop at the first match
+            if get_text_cache() is None and pdf_native_search and file_type == ".pdf":
+                found = search_pdf_native(file_path, search_text)
+                success_logger.info(f"Successfully processed: {file_path}")
+                return found
+            if get_text_cache() is None:
+                return bool(stream_search(file_path, extractor, matcher, search_text))
+
+        # With the cache the full text is extracted once and reused by later searches
+        text = extract_text(file_path, extractor)
+        if text is None:
+            return False
 
         # Check for exact case-sensitive match
         if search_text in text:
@@ -149,22 +889,514 @@ def search_text_in_file(file_path, search_text):
         unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
         return False
 
-# Recursively search for files and check for text
-def search_files(directory, search_text, file_extension=None):
+# Build the matcher for a set of terms once per process
+@functools.lru_cache(maxsize=4)
+def get_term_matcher(terms):
+    return create_term_matcher(terms)
+
+# Search for several terms in a file in one pass and return the terms it contains
+def search_terms_in_file(file_path, terms, text=None):
+    try:
+        matcher = get_term_matcher(terms)
+        if len(matcher.terms) == 1:
+            # A single term is a text search, which searches plain text files in place
+            return list(matcher.terms) if search_text_in_file(file_path, matcher.terms[0], text) else []
+
+        extractor = get_extractor(file_path)
+        if extractor is None:
+            return []  # Skip unsupported file types
+        if text is None and (get_text_cache() is None or file_path.endswith(".txt")):
+            found = stream_search(file_path, extractor, matcher.scan)
+        else:
+            text = extract_text(file_path, extractor, text)
+            found = None if text is None else matcher.scan((text,))
+        return matcher.matched_terms(found) if found else []
+    except Exception as e:
+        error_message = f"Error searching in file {file_path}: {e}"
+        unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
+        return []
+
+# True if an archive member is searched: a supported type that passes the extension filter
+def _member_wanted(member_path, file_extension=None):
+    name = member_path.rsplit("/", 1)[-1]
+    if not name.endswith(SUPPORTED_EXTENSIONS):
+        return False
+    return not file_extension or fnmatch.fnmatch(name, f"*{file_extension}")
+
+# Run a matcher over the text of an archive member; returns None if it cannot be read.
+# Member text is cached under the member's path against the archive's stat.
+def search_archive_member(entry, archive_stat, matcher, search_text=None):
+    cache = get_text_cache()
+    if cache is not None:
+        hit, text = cache.get(entry.path, archive_stat)
+        if hit:
+            if text is None:
+                unsuccessful_logger.warning(f"Unsuccessful: {entry.path} - failed in an earlier search (cached)")
+                return None
+            success_logger.info(f"Successfully processed (cached): {entry.path}")
+            return matcher((text,))
+
+    size_limit = file_limits["member_size"]
+    try:
+        if size_limit is not None and entry.size > size_limit:
+            raise FileLimitExceeded(
+                f"{entry.path} is {entry.size / (1024 * 1024):.1f} MB, "
+                f"over the archive member limit of {size_limit // (1024 * 1024)} MB"
+            )
+        member = entry.read(size_limit)
+    except Exception as e:
+        error_message = f"Error reading archive member {entry.path}: {e}"
+        unsuccessful_logger.warning(f"Unsuccessful: {entry.path} - {error_message}")
+        return None
+
+    with member:
+        if cache is None:
+            return stream_search(member, extract_text_from_file, matcher, search_text)
+        try:
+            text = read_text(member, extract_text_from_file)
+        except FileLimitExceeded as e:
+            unsuccessful_logger.warning(f"Unsuccessful: {entry.path} - {e}")
+            return None
+        cache.put(entry.path, archive_stat, text)
+    return None if text is None else matcher((text,))
+
+# Search the supported members of a zip or tar archive, and of the archives nested
+# in it, streaming them into the extractors without unpacking anything to disk.
+# Returns the matches as iter_search yields them, named like backup.zip!/docs/report.docx.
+def search_archive(archive_path, search_text=None, terms=None, file_extension=None):
+    if terms:
+        term_matcher = get_term_matcher(terms)
+        matcher = term_matcher.scan
+    else:
+        matcher = lambda chunks: text_in_chunks(chunks, search_text)
     matches = []
-    for root, _, files in os.walk(directory, onerror=lambda e: None):
-        for file in files:
+    try:
+        stat = os.stat(archive_path)
+        entries = iter_archive(archive_path, archive_path, file_limits["member_size"], file_limits["archive_depth"])
+        for entry in entries:
+            if cancel_event is not None and cancel_event.is_set():
+                raise SearchCancelled()
+            if entry.skipped is not None:
+                unsuccessful_logger.warning(f"Unsuccessful: {entry.path} - {entry.skipped}")
+                continue
+            if not _member_wanted(entry.path, file_extension):
+                continue
+            found = search_archive_member(entry, stat, matcher, search_text)
+            if found:
+                matches.append((entry.path, term_matcher.matched_terms(found)) if terms else entry.path)
+    except Exception as e:
+        # Matches found before the damaged part of the archive still count
+        error_message = f"Error reading archive {archive_path}: {e}"
+        unsuccessful_logger.warning(f"Unsuccessful: {archive_path} - {error_message}")
+    return matches
+
+# Search a file, or the members of an archive, and return its matches as
+# iter_search yields them (text is only given for PDFs split across workers)
+def search_path(file_path, search_text=None, terms=None, file_extension=None, text=None):
+    if file_limits["archive_depth"] and is_archive(file_path):
+        return search_archive(file_path, search_text, terms, file_extension)
+    if terms:
+        found = search_terms_in_file(file_path, terms, text)
+        return [(file_path, found)] if found else []
+    return [file_path] if search_text_in_file(file_path, search_text, text) else []
+
+# Read search terms from a file, one per line
+def read_terms(terms_file):
+    with open(terms_file, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+# Walk a directory and yield the supported files that pass the extension filter
+def iter_files(directory, file_extension=None, walker=None):
+    if walker is None:
+        walker = Walker(extensions=EXTRACTORS, containers=ARCHIVE_EXTENSIONS)
+    return walker.walk(directory, file_extension)
+
+# Upper bound on files submitted to the pool but not yet collected
+MAX_PENDING_FILES = 256
+
+# Statistics of the running search, collected in the main process
+search_stats = None
+
+# Collect throughput statistics for the following searches (None turns them off)
+def configure_search_stats(stats):
+    global search_stats
+    search_stats = stats
+
+# Run a per-file function and measure it.
+# Returns (result, (file_path, seconds, size_in_bytes, chunks)).
+def timed_call(function, file_path, *args):
+    global chunk_count
+    chunk_count = 0
+    start = time.perf_counter()
+    result = function(file_path, *args)
+    seconds = time.perf_counter() - start
+    try:
+        size = os.stat(file_path).st_size
+    except OSError:
+        size = 0
+    return result, (file_path, seconds, size, chunk_count)
+
+# Yield the walked files, adding the time spent walking to the stats
+def _timed_walk(file_paths):
+    iterator = iter(file_paths)
+    while True:
+        start = time.perf_counter()
+        try:
+            file_path = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            if search_stats is not None:
+                search_stats.walk_seconds += time.perf_counter() - start
+        yield file_path
+
+def _record_stats(timed_result):
+    result, file_stats = timed_result
+    if search_stats is not None:
+        search_stats.record(file_stats)
+    return result
+
+# Set up a worker process with the main process's cache, PDF, cancellation and logging settings
+def init_worker(cache_settings, native_pdf_search, limits, event, queue, profile_dir):
+    # Ctrl+C reaches the whole process group; the main process stops the workers
+    # through the cancellation token instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_text_cache(*cache_settings)
+    configure_pdf_search(native_pdf_search)
+    configure_limits(**limits)
+    configure_cancel_event(event)
+    if queue is not None:
+        use_log_queue(queue)
+    if profile_dir:
+        # Worker processes skip atexit, so write the profile from a multiprocessing finalizer
+        dump = start_profiler(os.path.join(profile_dir, f"worker-{os.getpid()}.prof"))
+        multiprocessing.util.Finalize(None, dump, exitpriority=10)
+
+# Directory where worker processes write cProfile output (None disables profiling)
+profile_dir = None
+
+# Create a process pool for parallel extraction (None means search serially).
+# Workers check the cancellation token set with configure_cancel_event.
+# The pool replaces a worker process that dies, so a crash only fails the file
+# it was reading. With a per-file timeout or memory cap, files are always read
+# in worker processes, which are killed when they go over the limit.
+def create_worker_pool(workers):
+    limited = file_limits["timeout"] is not None or file_limits["memory"] is not None
+    if (not workers or workers <= 1) and not limited:
+        return None
+    # Spawn gives the same behaviour on Linux, Windows and from the GUI thread
+    return SupervisedPool(
+        max(workers or 1, 1),
+        multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(text_cache_settings(), pdf_native_search, file_limits, cancel_event, PipeLogQueue(), profile_dir),
+        timeout=file_limits["timeout"],
+        max_memory=file_limits["memory"],
+    )
+
+# Run a function over files, on the pool if there is one, and yield
+# (file_path, result) pairs in input order; failed calls yield None.
+# On the pool, large PDFs are extracted as several page ranges in parallel and
+# the function is then run here with the joined text.
+# With a Deduplicator, a file whose content was seen before is not processed
+# again: it yields the result of the first file with that content.
+# Stops submitting files once the cancellation token is set.
+def map_files(function, file_paths, executor=None, *args, deduplicator=None):
+    file_paths = _timed_walk(file_paths)
+    # Results that later duplicates share; files without a result share None
+    shared_results = {}
+
+    if executor is None:
+        for file_path in file_paths:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            original = deduplicator.original_of(file_path) if deduplicator is not None else None
+            if original is not None:
+                yield _duplicate_result(file_path, original, shared_results)
+                continue
             try:
-                file_path = os.path.join(root, file)
-                # Check if the file matches the extension (if provided)
-                if file_extension and not fnmatch.fnmatch(file, f"*{file_extension}"):
-                    continue
-                if search_text_in_file(file_path, search_text):
-                    matches.append(file_path)
+                result = _record_stats(timed_call(function, file_path, *args))
+            except SearchCancelled:
+                return
             except Exception as e:
                 error_message = f"Error processing file {file_path}: {e}"
                 unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
-    return matches
+                result = None
+            if deduplicator is not None and result:
+                shared_results[file_path] = result
+            yield file_path, result
+        return
+
+    # Keep a bounded number of files in flight so the walk never runs far ahead
+    pending = deque()
+    for file_path in file_paths:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        original = deduplicator.original_of(file_path) if deduplicator is not None else None
+        if original is not None:
+            # Its original is ahead of it in the queue and done by the time it is collected
+            pending.append((file_path, None, original))
+        else:
+            try:
+                page_ranges = pdf_page_ranges(file_path) if file_path.endswith(".pdf") else None
+            except Exception:
+                page_ranges = None  # Let the worker open it and report the error
+            if page_ranges:
+                futures = [
+                    _submit(executor, timed_call, extract_pdf_pages, file_path, start, stop)
+                    for start, stop in page_ranges
+                ]
+            else:
+                futures = [_submit(executor, timed_call, function, file_path, *args)]
+            pending.append((file_path, futures, None))
+        if len(pending) >= MAX_PENDING_FILES:
+            yield _collect_pending(pending.popleft(), function, args, deduplicator, shared_results)
+    while pending:
+        if cancel_event is not None and cancel_event.is_set():
+            # Drop queued work; running tasks stop at their next chunk
+            for _, futures, _ in pending:
+                for future in futures or ():
+                    future.cancel()
+            return
+        yield _collect_pending(pending.popleft(), function, args, deduplicator, shared_results)
+
+# Submit a task to the pool. A pool whose workers cannot start fails the task
+# instead of the whole search, and each file reports the reason.
+def _submit(executor, function, *args):
+    try:
+        return executor.submit(function, *args)
+    except WorkerKilled as e:
+        future = Future()
+        future.set_exception(e)
+        return future
+
+def _collect_pending(entry, function, args, deduplicator, shared_results):
+    file_path, futures, original = entry
+    if original is not None:
+        return _duplicate_result(file_path, original, shared_results)
+    result = _collect_result(file_path, futures, function, args)
+    if deduplicator is not None and result[1]:
+        shared_results[file_path] = result[1]
+    return result
+
+def _duplicate_result(file_path, original, shared_results):
+    success_logger.info(f"Successfully processed (duplicate of {original}): {file_path}")
+    return file_path, shared_results.get(original)
+
+def _collect_result(file_path, futures, function, args):
+    try:
+        if len(futures) == 1:
+            return file_path, _record_stats(futures[0].result())
+        # The page ranges of a split PDF count as one file
+        ranges = [future.result() for future in futures]
+        start = time.perf_counter()
+        result = function(file_path, *args, text="".join(text for text, _ in ranges))
+        seconds = time.perf_counter() - start + sum(file_stats[1] for _, file_stats in ranges)
+        chunks = sum(file_stats[3] for _, file_stats in ranges)
+        return file_path, _record_stats((result, (file_path, seconds, ranges[0][1][2], chunks)))
+    except (SearchCancelled, CancelledError):
+        return file_path, None
+    except Exception as e:
+        error_message = f"Error processing file {file_path}: {e}"
+        unsuccessful_logger.warning(f"Unsuccessful: {file_path} - {error_message}")
+        return file_path, None
+
+# Check a list of files for the text and return the ones that match
+def match_files(file_paths, search_text, executor=None):
+    return [
+        file_path
+        for file_path, found in map_files(search_text_in_file, file_paths, executor, search_text)
+        if found
+    ]
+
+# Check a list of files for several terms and return (file_path, matched_terms) pairs
+def match_files_terms(file_paths, terms, executor=None):
+    return [
+        (file_path, found)
+        for file_path, found in map_files(search_terms_in_file, file_paths, executor, tuple(terms))
+        if found
+    ]
+
+# Recursively search for files and check for text
+def search_files(directory, search_text, file_extension=None, executor=None, walker=None):
+    return match_files(iter_files(directory, file_extension, walker), search_text, executor)
+
+# Recursively search for files and check for several terms in one walk
+def search_files_terms(directory, terms, file_extension=None, executor=None, walker=None):
+    return match_files_terms(iter_files(directory, file_extension, walker), terms, executor)
+
+# Extract a file and return its stat and text trigrams for the index
+def index_file(file_path, text=None):
+    stat = os.stat(file_path)
+    text = extract_text(file_path, get_extractor(file_path), text)
+    # Unreadable files are indexed with no trigrams so they are not retried until they change
+    return stat, text_trigrams(text) if text else b""
+
+# Bring the index up to date with the files under the given roots
+def build_index(index, roots, executor=None, walker=None):
+    roots = [os.path.abspath(root) for root in roots]
+    seen_paths = set()
+    changed_paths = []
+    for root in roots:
+        for file_path in iter_files(root, walker=walker):
+            if is_archive(file_path):
+                continue  # Archives are searched member by member, not indexed
+            seen_paths.add(file_path)
+            try:
+                if index.needs_update(file_path, os.stat(file_path)):
+                    changed_paths.append(file_path)
+            except OSError:
+                seen_paths.discard(file_path)
+
+    for file_path, result in map_files(index_file, changed_paths, executor):
+        if result is None:
+            index.remove(file_path)
+        else:
+            index.update(file_path, *result)
+    index.remove_missing(roots, seen_paths)
+    index.commit()
+    return len(seen_paths), len(changed_paths)
+
+# Indexed files under the search paths whose trigrams can contain any of the texts
+def index_candidates(index, search_paths, search_texts, file_extension=None):
+    candidates = {}
+    for search_text in search_texts:
+        for file_path in index.candidates(search_text):
+            candidates[file_path] = None
+    return [
+        file_path
+        for file_path in candidates
+        if is_under_roots(file_path, search_paths)
+        and (not file_extension or fnmatch.fnmatch(os.path.basename(file_path), f"*{file_extension}"))
+    ]
+
+# Yield matches as they are found, in walk order: file paths, or
+# (file_path, matched_terms) pairs when searching for several terms.
+# With an index only its candidate files are checked instead of walking the search paths.
+# With a scan journal the directories it lists as finished are skipped, and
+# progress and matches are recorded in it.
+def iter_search(
+    search_paths, search_text=None, terms=None, file_extension=None, executor=None, walker=None, index=None,
+    journal=None, deduplicator=None,
+):
+    if index is not None:
+        file_paths = index_candidates(index, search_paths, terms or [search_text], file_extension)
+    else:
+        file_paths = (
+            file_path for path in search_paths for file_path in iter_files(path, file_extension, walker)
+        )
+        if journal is not None:
+            file_paths = (file_path for file_path in file_paths if not journal.is_done(file_path))
+
+    yield from iter_matches(file_paths, search_text, terms, executor, file_extension, journal, deduplicator)
+
+# Check the given files, and the members of archives among them, and yield the
+# matches like iter_search. With a Deduplicator, files with the same content are
+# searched once and the matches are reported under every path.
+def iter_matches(
+    file_paths, search_text=None, terms=None, executor=None, file_extension=None, journal=None, deduplicator=None,
+):
+    terms = tuple(terms) if terms else None
+    for file_path, found in map_files(
+        search_path, file_paths, executor, search_text, terms, file_extension, deduplicator=deduplicator
+    ):
+        if found and deduplicator is not None and file_path in deduplicator.originals:
+            found = _rename_matches(found, deduplicator.originals[file_path], file_path)
+        if journal is None:
+            yield from found or ()
+            continue
+        if cancel_event is not None and cancel_event.is_set():
+            return  # Files after the cancellation were not searched to the end
+        for match in found or ():
+            # Matches of a partly searched directory are found again after a resume
+            if journal.record_match(match):
+                yield match
+        journal.file_done(file_path)
+
+# The matches of a file as found in an identical copy of it; matches inside an
+# archive keep their member path
+def _rename_matches(matches, original, file_path):
+    renamed = []
+    for match in matches:
+        match_path = match[0] if isinstance(match, tuple) else match
+        match_path = file_path + match_path[len(original):]
+        renamed.append((match_path, match[1]) if isinstance(match, tuple) else match_path)
+    return renamed
+
+# Drop a deleted file, or every file under a deleted directory or in a deleted
+# archive, from the text cache and the index
+def forget_path(path, index=None):
+    cache = get_text_cache()
+    if cache is not None:
+        cache.remove(path)
+        cache.remove_prefix(os.path.join(path, ""))
+        cache.remove_prefix(path + ARCHIVE_SEPARATOR)
+    if index is not None:
+        index.remove_missing([path], set())
+
+# Keep the results of a finished search current until it is cancelled: watch the
+# search paths and check only the files that are created or changed, yielding
+# ("added", match) for new or changed matches and ("removed", match) for matches
+# that were deleted or no longer match. matches maps the path of every match so
+# far to its match and is kept up to date. With an index, changed files are
+# reindexed as well (the posting lists are rewritten when watching stops).
+def watch_search(
+    matches, search_paths, search_text=None, terms=None, file_extension=None, executor=None, walker=None,
+    index=None, poll_interval=None,
+):
+    from watcher import RESCAN, create_watcher, watch_changes
+
+    if walker is None:
+        walker = Walker(extensions=EXTRACTORS, containers=ARCHIVE_EXTENSIONS)
+    if index is not None:
+        # Indexed paths are absolute
+        search_paths = [os.path.abspath(path) for path in search_paths]
+    watcher = create_watcher(search_paths, walker, poll_interval)
+    try:
+        for changes in watch_changes(watcher, cancel_event):
+            if RESCAN in changes:
+                # Events were lost: check everything again
+                if index is not None:
+                    build_index(index, search_paths, executor, walker)
+                checked = None
+                found = iter_search(search_paths, search_text, terms, file_extension, executor, walker, index)
+            else:
+                checked = set()
+                for path in changes:
+                    if os.path.isfile(path):
+                        if any(walker.accepts(root, path, file_extension) for root in search_paths):
+                            checked.add(path)
+                            # Every member of a changed archive is checked again
+                            prefix = path + ARCHIVE_SEPARATOR
+                            checked.update(match_path for match_path in matches if match_path.startswith(prefix))
+                    elif not os.path.exists(path):
+                        forget_path(path, index)
+                        prefixes = (os.path.join(path, ""), path + ARCHIVE_SEPARATOR)
+                        checked.update(match_path for match_path in matches if match_path.startswith(prefixes))
+                        checked.add(path)
+                file_paths = [path for path in checked if os.path.isfile(path)]
+                if index is not None:
+                    indexed_paths = [path for path in file_paths if not is_archive(path)]
+                    for file_path, result in map_files(index_file, indexed_paths, executor):
+                        if result is None:
+                            index.remove(file_path)
+                        else:
+                            index.update(file_path, *result)
+                    index.commit()
+                found = iter_matches(file_paths, search_text, terms, executor, file_extension)
+
+            found = {match[0] if terms else match: match for match in found}
+            for path in list(matches if checked is None else checked & matches.keys()):
+                if path not in found:
+                    yield "removed", matches.pop(path)
+            for path, match in found.items():
+                if matches.get(path) != match:
+                    matches[path] = match
+                    yield "added", match
+    finally:
+        watcher.close()
+        if index is not None:
+            index.commit()
 
 # Get root directories based on OS
 def get_root_directories():
@@ -177,13 +1409,336 @@ def get_root_directories():
     else:
         raise Exception("Unsupported operating system")
 
+# Address the search daemon ("main.py serve") listens on and clients connect to.
+# Only loopback: the daemon answers with the names of files it can read.
+DEFAULT_DAEMON_ADDRESS = "127.0.0.1:8765"
+
+# Parse command line options
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Search for text inside .txt, .pdf, .docx, .pptx and .xlsx files.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes used for text extraction (1 searches serially)",
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help=f"Extracted text cache database (default: {DEFAULT_CACHE_PATH})",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f"Maximum cache size in MB before old entries are evicted (default: {DEFAULT_CACHE_SIZE_MB})",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Always extract text from the files")
+    parser.add_argument(
+        "--index-dir",
+        default=DEFAULT_INDEX_DIR,
+        help=f"Directory of the trigram index (default: {DEFAULT_INDEX_DIR})",
+    )
+    parser.add_argument(
+        "--use-index",
+        action="store_true",
+        help="Answer the search from the trigram index instead of scanning every file",
+    )
+    parser.add_argument(
+        "--term",
+        action="append",
+        default=[],
+        help="Search for this term; repeat to search for several terms in one pass",
+    )
+    parser.add_argument("--terms-file", help="Read search terms from a file, one per line")
+    parser.add_argument(
+        "--pdf-native-search",
+        action="store_true",
+        help="With --no-cache, search PDFs with MuPDF's page search instead of extracting their text",
+    )
+    parser.add_argument(
+        "--daemon",
+        nargs="?",
+        const=DEFAULT_DAEMON_ADDRESS,
+        metavar="ADDRESS",
+        help=f"Send the search to a running search daemon (default address: {DEFAULT_DAEMON_ADDRESS})",
+    )
+    parser.add_argument(
+        "--stats",
+        metavar="FILE",
+        help="Write per-format timings, throughput and the slowest files as JSON ('-' for the console)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Write cProfile output for the main process and each worker process to this directory",
+    )
+    parser.add_argument(
+        "--max-file-size",
+        action="append",
+        default=[],
+        metavar="[TYPE=]MB",
+        help="Skip files larger than this; prefix a type (e.g. pdf=500) to set the limit for one file type",
+    )
+    parser.add_argument("--max-pages", type=int, help="Skip PDFs and presentations with more pages or slides")
+    parser.add_argument("--max-rows", type=int, help="Skip workbooks with more rows")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Stop reading a file after this many seconds; its worker process is killed and replaced",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        metavar="MB",
+        help="Kill the worker process reading a file once it uses more memory than this (Linux)",
+    )
+    parser.add_argument(
+        "--max-member-size",
+        type=int,
+        default=DEFAULT_MEMBER_SIZE_MB,
+        metavar="MB",
+        help=f"Skip archive members larger than this once decompressed (default: {DEFAULT_MEMBER_SIZE_MB})",
+    )
+    parser.add_argument(
+        "--archive-depth",
+        type=int,
+        default=DEFAULT_MAX_DEPTH,
+        help=f"Levels of nested zip and tar archives to search inside; 0 skips archives (default: {DEFAULT_MAX_DEPTH})",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        help="Skip files and directories matching this glob (name or full path); repeatable",
+    )
+    parser.add_argument(
+        "--ignore-file",
+        help="Name of .gitignore-style files (e.g. .gitignore) whose patterns are skipped in their directory tree",
+    )
+    parser.add_argument("--xdev", action="store_true", help="Stay on the filesystem of each starting path")
+    parser.add_argument(
+        "--include-pseudo",
+        action="store_true",
+        help="Also walk pseudo filesystems such as /proc, /sys and /dev",
+    )
+    parser.add_argument(
+        "--walk-threads",
+        type=int,
+        default=1,
+        help="Directories scanned concurrently; raise it for network shares and other slow storage",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Search every copy and hardlink of a file instead of searching identical files once",
+    )
+    parser.add_argument(
+        "--duplicates",
+        metavar="FILE",
+        help="Write the groups of identical files found during the search as JSON ('-' for the console)",
+    )
+    parser.add_argument(
+        "--journal",
+        metavar="FILE",
+        help=f"Record the progress of the scan in this file (system-wide scans use {DEFAULT_JOURNAL_PATH})",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="FILE",
+        help="Continue the interrupted scan recorded in this journal, with its search text, paths and filter",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After the search, keep watching the search paths and report files that start or stop matching",
+    )
+    parser.add_argument(
+        "--watch-poll",
+        type=float,
+        metavar="SECONDS",
+        help="With --watch, look for changes by rescanning at this interval instead of using inotify "
+        "(for network shares and systems without inotify)",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    index_parser = subparsers.add_parser("index", help="Build or update the trigram index")
+    index_parser.add_argument("roots", nargs="+", help="Directories to index")
+    serve_parser = subparsers.add_parser("serve", help="Run a search daemon that keeps caches and workers warm")
+    serve_parser.add_argument(
+        "--listen",
+        default=DEFAULT_DAEMON_ADDRESS,
+        metavar="ADDRESS",
+        help=f"Loopback address to listen on (default: {DEFAULT_DAEMON_ADDRESS})",
+    )
+    return parser.parse_args(argv)
+
+# Turn --max-file-size values ("200", "pdf=500") into the file_size limits
+def parse_size_limits(values):
+    limits = {}
+    for value in values:
+        file_type, _, size = value.rpartition("=")
+        file_type = f".{file_type.lower().lstrip('.')}" if file_type else None
+        if file_type is not None and file_type not in EXTRACTORS:
+            raise ValueError(f"unknown file type in --max-file-size {value}")
+        limits[file_type] = int(float(size) * 1024 * 1024)
+    return limits
+
+# Create the directory walker configured on the command line
+def create_walker(args, cache_listings=False):
+    return Walker(
+        extensions=EXTRACTORS,
+        exclude=args.exclude,
+        ignore_file=args.ignore_file,
+        same_device=args.xdev,
+        skip_pseudo=not args.include_pseudo,
+        threads=args.walk_threads,
+        cache_listings=cache_listings,
+        containers=ARCHIVE_EXTENSIONS if args.archive_depth > 0 else (),
+    )
+
+# Build or update the trigram index from the command line
+def run_index(args):
+    print("\nIndexing... This may take some time.")
+    index = TrigramIndex(args.index_dir)
+    executor = create_worker_pool(args.workers)
+    try:
+        total, updated = build_index(index, args.roots, executor, create_walker(args))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        index.close()
+    print(f"\nIndexed {total} files ({updated} new or changed).")
+
+# Serve searches from one long-running process so repeat searches skip startup,
+# reuse the worker pool and only rescan directories that changed
+def run_serve(args):
+    from search_daemon import DEFAULT_TOKEN_PATH, SearchDaemon, ensure_token, is_loopback, parse_address
+
+    if not is_loopback(parse_address(args.listen)[0]):
+        print(f"Invalid option: the search daemon only listens on the loopback interface, not on {args.listen}")
+        return
+    try:
+        token = ensure_token()
+    except OSError as e:
+        print(f"Could not create the search daemon token {DEFAULT_TOKEN_PATH}: {e}")
+        return
+    configure_cancel_event(create_cancel_event())
+    walker = create_walker(args, cache_listings=True)
+    executor = create_worker_pool(args.workers)
+
+    def search(request):
+        cancel_event.clear()
+        clear_log_files()
+        stats = SearchStats()
+        configure_search_stats(stats)
+        # Opened per search so that updates from "main.py index" are picked up;
+        # until an index is built, searches walk the directories
+        index = TrigramIndex(args.index_dir) if args.use_index and index_exists(args.index_dir) else None
+        try:
+            for match in iter_search(
+                request.get("paths") or get_root_directories(),
+                request.get("search_text"),
+                request.get("terms"),
+                request.get("file_extension"),
+                executor,
+                walker,
+                index,
+                deduplicator=Deduplicator(get_text_cache()),
+            ):
+                if isinstance(match, tuple):
+                    yield {"path": match[0], "terms": match[1]}
+                else:
+                    yield {"path": match}
+        finally:
+            if index is not None:
+                index.close()
+            if get_text_cache() is not None:
+                get_text_cache().trim()
+        stats.finish()
+        yield {"summary": stats.summary_line()}
+
+    server = SearchDaemon(args.listen, search, cancel_event.set, token)
+    print(f"Search daemon listening on http://{args.listen} (token in {DEFAULT_TOKEN_PATH}). Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping the search daemon.")
+    finally:
+        server.server_close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+# A match as printed on the console
+def format_match(match):
+    if isinstance(match, tuple):
+        return f"{match[0]}: {', '.join(match[1])}"
+    return match
+
+# Run a search on the search daemon and print the matches as they arrive
+def run_daemon_search(address, search_paths, search_text, terms, file_extension):
+    from search_daemon import cancel_daemon_search, daemon_search, match_from_result
+
+    print(f"\nSearching with the search daemon at {address}... Press Ctrl+C to stop.")
+    match_count = 0
+    summary = None
+    try:
+        for result in daemon_search(address, search_paths, search_text, terms, file_extension):
+            if "summary" in result:
+                summary = result["summary"]
+                continue
+            if match_count == 0:
+                print("\nMatches found in the following files:")
+            match_count += 1
+            print(format_match(match_from_result(result)), flush=True)
+    except KeyboardInterrupt:
+        cancel_daemon_search(address)
+        print("\nSearch stopped.")
+    except OSError as e:
+        print(f"\nSearch failed: {e}")
+
+    if match_count:
+        print(f"\n{match_count} matching files.")
+    else:
+        print("\nNo matches found.")
+    if summary:
+        print(summary)
+
 # Main function
 def main():
-    clear_log_files()
-    search_text = input("Enter the text to search: ").strip()
-    if not search_text:
-        print("No search text provided.")
-        return
+    global profile_dir
+    args = parse_args()
+    # The daemon writes and clears its own log files, and a resumed scan adds to the logs of the interrupted one
+    if (not args.daemon or args.watch) and not args.resume:
+        clear_log_files()
+    start_log_listener()
+    try:
+        if args.profile:
+            os.makedirs(args.profile, exist_ok=True)
+            profile_dir = args.profile
+            dump_profile = start_profiler(os.path.join(args.profile, "main.prof"))
+            try:
+                run(args)
+            finally:
+                dump_profile()
+        else:
+            run(args)
+    finally:
+        stop_log_listener()
+
+# Ask for the search text (unless terms were given), the starting paths and the
+# extension filter. Returns (search_text, terms, search_paths, file_extension,
+# system_wide), or None without search text.
+def prompt_search(args):
+    terms = list(args.term)
+    if args.terms_file:
+        terms.extend(read_terms(args.terms_file))
+    if terms:
+        search_text = None
+    else:
+        search_text = input("Enter the text to search: ").strip()
+        if not search_text:
+            print("No search text provided.")
+            return None
 
     search_paths = (
         input(
@@ -193,7 +1748,8 @@ def main():
         .split(",")
     )
     search_paths = [path.strip() for path in search_paths if path.strip()]
-    if not search_paths:
+    system_wide = not search_paths
+    if system_wide:
         search_paths = get_root_directories()
 
     file_extension = (
@@ -202,18 +1758,171 @@ def main():
         ).strip()
         or None
     )
+    return search_text, terms, search_paths, file_extension, system_wide
 
-    print("\nSearching... This may take some time.")
-    matches = []
-    for path in search_paths:
-        matches.extend(search_files(path, search_text, file_extension))
+# Run the index build or the search selected on the command line
+def run(args):
+    configure_text_cache(None if args.no_cache else args.cache, args.cache_size)
+    configure_pdf_search(args.pdf_native_search)
+    try:
+        file_size = parse_size_limits(args.max_file_size)
+    except ValueError as e:
+        print(f"Invalid option: {e}")
+        return
+    configure_limits(
+        file_size=file_size,
+        pages=args.max_pages,
+        rows=args.max_rows,
+        timeout=args.timeout,
+        memory=args.max_memory * 1024 * 1024 if args.max_memory else None,
+        member_size=args.max_member_size * 1024 * 1024,
+        archive_depth=args.archive_depth,
+    )
+    if args.command == "index":
+        run_index(args)
+        return
+    if args.command == "serve":
+        run_serve(args)
+        return
+    # A resumed scan walks the directories and does not use the index
+    if args.use_index and not args.resume and not index_exists(args.index_dir):
+        print(f"No trigram index in {args.index_dir}; run `main.py index <roots>` first.")
+        return
+
+    journal = None
+    if args.resume:
+        try:
+            journal = ScanJournal.resume(args.resume)
+        except (OSError, ValueError) as e:
+            print(f"Cannot resume the scan: {e}")
+            return
+        search = journal.search
+        search_text, terms, search_paths, file_extension = (
+            search["search_text"], search["terms"], search["paths"], search["file_extension"]
+        )
+        if journal.finished:
+            print(f"\nThe scan recorded in {args.resume} already finished.")
+            for match in journal.matches.values():
+                print(format_match(match))
+            journal.close()
+            return
+        print(
+            f"\nResuming the scan of {', '.join(search_paths)}: {len(journal.done_directories)} directories "
+            f"already searched, {len(journal.matches)} matches so far."
+        )
+    else:
+        search = prompt_search(args)
+        if search is None:
+            return
+        search_text, terms, search_paths, file_extension, system_wide = search
+
+        # Watching needs the local walker, so --watch always searches locally
+        if args.daemon and not args.watch:
+            from search_daemon import daemon_status
+
+            if daemon_status(args.daemon) is not None:
+                run_daemon_search(args.daemon, search_paths, search_text, terms, file_extension)
+                return
+            print(f"\nNo search daemon at {args.daemon}, searching locally.")
+            clear_log_files()
+
+        # Index searches are quick, so only walks are journaled
+        if (args.journal or system_wide) and not args.use_index:
+            journal_path = args.journal or DEFAULT_JOURNAL_PATH
+            journal = ScanJournal.create(
+                journal_path,
+                {"search_text": search_text, "terms": terms, "paths": search_paths, "file_extension": file_extension},
+            )
+            # Walk the absolute paths the journal stores, so its directories match after a resume
+            search_paths = journal.search["paths"]
+            print(f"\nProgress is saved to {journal_path}; continue an interrupted scan with --resume {journal_path}")
+
+    print("\nSearching... This may take some time. Press Ctrl+C to stop.")
+    matches = {}
+    stats = SearchStats()
+    configure_search_stats(stats)
+    index = TrigramIndex(args.index_dir) if args.use_index and journal is None else None
+    deduplicator = None if args.no_dedup else Deduplicator(get_text_cache())
+    # Watching rescans directories while polling, so keep their listings
+    walker = create_walker(args, cache_listings=args.watch)
+    configure_cancel_event(create_cancel_event())
+    executor = create_worker_pool(args.workers)
+    changes = None
+    try:
+        if journal is not None and journal.matches:
+            print("\nMatches found in the following files:")
+            for match in journal.matches.values():
+                matches[match[0] if terms else match] = match
+                print(format_match(match))
+        # Print each match as soon as it is found
+        for match in iter_search(
+            search_paths, search_text, terms, file_extension, executor, walker, index, journal, deduplicator
+        ):
+            if not matches:
+                print("\nMatches found in the following files:")
+            matches[match[0] if terms else match] = match
+            print(format_match(match), flush=True)
+        if journal is not None:
+            journal.finish()
+        if args.watch:
+            # The statistics cover the initial search, not the time spent waiting for changes
+            stats.finish()
+            configure_search_stats(None)
+            print(f"\n{len(matches)} matching files. {stats.summary_line()}")
+            print("Watching for changes... Press Ctrl+C to stop.", flush=True)
+            changes = watch_search(
+                matches, search_paths, search_text, terms, file_extension, executor, walker, index, args.watch_poll
+            )
+            for change, match in changes:
+                print(f"{'+' if change == 'added' else '-'} {format_match(match)}", flush=True)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        print("\nSearch stopped.")
+    finally:
+        if journal is not None:
+            journal.close()
+        if changes is not None:
+            # Saves the index changes made while watching
+            changes.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if index is not None:
+            index.close()
+        if get_text_cache() is not None:
+            get_text_cache().trim()
 
     if matches:
-        print("\nMatches found in the following files:")
-        for match in matches:
-            print(match)
+        print(f"\n{len(matches)} matching files.")
     else:
         print("\nNo matches found.")
 
+    if stats.finished is None:
+        stats.finish()
+    print(stats.summary_line())
+    if args.stats == "-":
+        print(json.dumps(stats.summary(), indent=2))
+    elif args.stats:
+        stats.write_json(args.stats)
+    if deduplicator is not None:
+        report_duplicates(deduplicator.groups(), args.duplicates)
+
+# Summarize the identical files that were searched once, and list the groups
+# on the console or in a JSON file
+def report_duplicates(groups, destination=None):
+    if not groups:
+        return
+    duplicates = sum(len(copies) for copies in groups.values())
+    print(f"{duplicates} duplicate files in {len(groups)} groups were searched once per content.")
+    if destination == "-":
+        print("\nIdentical files:")
+        for original, copies in groups.items():
+            print(original)
+            for copy in copies:
+                print(f"  = {copy}")
+    elif destination:
+        with open(destination, "w", encoding="utf-8") as f:
+            json.dump([[original] + copies for original, copies in groups.items()], f, indent=2)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,103 @@
+import bisect
+import os
+
+# Orders the results can be shown in
+FOUND_ORDER = "Found order"
+PATH_ORDER = "Path"
+NAME_ORDER = "File name"
+SORT_ORDERS = (FOUND_ORDER, PATH_ORDER, NAME_ORDER)
+
+
+# The matches of a search, kept apart from any widget: path -> matched terms (None
+# for a text search) in the order they were found. The rows to show, filtered and
+# sorted, are kept up to date as matches arrive, so a view only draws the rows on
+# screen. Updates and removals, which only come from watched searches, rebuild the
+# rows the next time they are needed.
+class ResultStore:
+    def __init__(self):
+        self.matches = {}
+        self.term_sets = {}  # Matches with the same terms share one tuple
+        self.filter_text = ""
+        self.sort_order = FOUND_ORDER
+        self.rows = []  # Paths that pass the filter, in the sort order
+        self.keys = []  # Sort keys of the rows when sorted, for inserting in order
+        self.stale = False
+        self.version = 0  # Changes whenever the rows may have, so views know to redraw
+
+    def __len__(self):
+        return len(self.matches)
+
+    # Add a match as iter_search yields it, or update the terms of a known path
+    def add(self, match):
+        if isinstance(match, tuple):
+            path, terms = match[0], tuple(match[1])
+            terms = self.term_sets.setdefault(terms, terms)
+        else:
+            path, terms = match, None
+        known = path in self.matches
+        if known and self.matches[path] == terms:
+            return
+        self.matches[path] = terms
+        self.version += 1
+        if known:
+            self.stale = True  # Whether it passes the filter may have changed
+        elif not self.stale and self._passes(path, terms):
+            if self.sort_order == FOUND_ORDER:
+                self.rows.append(path)
+            else:
+                key = self._sort_key(path)
+                index = bisect.bisect_right(self.keys, key)
+                self.keys.insert(index, key)
+                self.rows.insert(index, path)
+
+    def remove(self, path):
+        if self.matches.pop(path, False) is not False:
+            self.stale = True
+            self.version += 1
+
+    def clear(self):
+        self.matches = {}
+        self.term_sets = {}
+        self.rows = []
+        self.keys = []
+        self.stale = False
+        self.version += 1
+
+    # Show only the rows containing filter_text (ignoring case), in sort_order
+    def set_view(self, filter_text="", sort_order=FOUND_ORDER):
+        self.filter_text = filter_text.strip().lower()
+        self.sort_order = sort_order
+        self.stale = True
+        self.version += 1
+
+    # The paths of the rows to show
+    def view(self):
+        if self.stale:
+            rows = [path for path, terms in self.matches.items() if self._passes(path, terms)]
+            if self.sort_order == FOUND_ORDER:
+                self.keys = []
+            elif self.sort_order == PATH_ORDER:
+                rows.sort()
+                self.keys = list(rows)
+            else:
+                ordered = sorted(zip(map(self._sort_key, rows), rows))
+                self.keys = [key for key, _ in ordered]
+                rows = [path for _, path in ordered]
+            self.rows = rows
+            self.stale = False
+        return self.rows
+
+    # The text of a row, as the CLI prints the match
+    def line(self, path):
+        return self._line(path, self.matches.get(path))
+
+    def _line(self, path, terms):
+        return path if terms is None else f"{path}: {', '.join(terms)}"
+
+    def _passes(self, path, terms):
+        return not self.filter_text or self.filter_text in self._line(path, terms).lower()
+
+    def _sort_key(self, path):
+        if self.sort_order == NAME_ORDER:
+            return os.path.basename(path).lower(), path
+        return path
@@ -0,0 +1,127 @@
+import json
+import os
+import time
+
+# Journal of system-wide scans when no other file is given
+DEFAULT_JOURNAL_PATH = "scan_journal.jsonl"
+
+# Progress is written to disk at least this often; a crash loses at most this much work
+CHECKPOINT_SECONDS = 5
+
+# Keeps Windows from translating line endings
+O_BINARY = getattr(os, "O_BINARY", 0)
+
+
+# Append-only journal of a long scan, one JSON record per line:
+#   {"search": {...}}                  the search parameters (first line)
+#   {"directory": path}                every file directly in this directory was searched
+#   {"match": path[, "terms": [...]]}  a match found so far
+#   {"finished": true}                 the scan completed
+# Records are collected in memory and appended to the file with one write and
+# an fsync per checkpoint. A record cut short by a crash is dropped on resume.
+class ScanJournal:
+    def __init__(self, path):
+        self.path = path
+        self.search = None
+        self.done_directories = set()
+        self.matches = {}  # path -> match as iter_search yields it
+        self.finished = False
+        self.current_directory = None
+        self.pending = []
+        self.last_checkpoint = time.monotonic()
+        self.fd = None
+
+    # Start a new journal for a search, replacing any journal at the path.
+    # The search paths are stored absolute, so the scan can be resumed from any directory.
+    @classmethod
+    def create(cls, path, search):
+        journal = cls(path)
+        journal.search = dict(search, paths=[os.path.abspath(search_path) for search_path in search["paths"]])
+        journal.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND | O_BINARY, 0o644)
+        journal._append({"search": journal.search})
+        journal.checkpoint()
+        return journal
+
+    # Open an existing journal to continue its scan.
+    # Raises OSError if it cannot be read and ValueError if it is not a scan journal.
+    @classmethod
+    def resume(cls, path):
+        journal = cls(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            record = json.loads(line)
+            if "search" in record:
+                journal.search = record["search"]
+            elif "directory" in record:
+                journal.done_directories.add(record["directory"])
+            elif "match" in record:
+                match_path = record["match"]
+                journal.matches[match_path] = (match_path, record["terms"]) if "terms" in record else match_path
+            elif record.get("finished"):
+                journal.finished = True
+        if journal.search is None:
+            raise ValueError(f"{path} is not a scan journal")
+        journal.fd = os.open(path, os.O_WRONLY | os.O_APPEND | O_BINARY)
+        # Appending after a partial record would corrupt the next one
+        os.ftruncate(journal.fd, len(complete))
+        return journal
+
+    # True if the file's directory was finished before the scan stopped
+    def is_done(self, file_path):
+        return os.path.dirname(file_path) in self.done_directories
+
+    # Record a match. Returns False if it was already recorded, i.e. found again
+    # in a directory that was only partly searched before the scan stopped.
+    def record_match(self, match):
+        path = match[0] if isinstance(match, tuple) else match
+        if path in self.matches:
+            return False
+        self.matches[path] = match
+        record = {"match": path}
+        if isinstance(match, tuple):
+            record["terms"] = list(match[1])
+        self._append(record)
+        return True
+
+    # Record that a file was searched. Files arrive in walk order, where the files
+    # of a directory come together, so a directory is finished once a file of
+    # another directory is done.
+    def file_done(self, file_path):
+        directory = os.path.dirname(file_path)
+        if directory != self.current_directory:
+            if self.current_directory is not None:
+                self._append({"directory": self.current_directory})
+            self.current_directory = directory
+
+    # Record that the scan completed
+    def finish(self):
+        if self.current_directory is not None:
+            self._append({"directory": self.current_directory})
+            self.current_directory = None
+        self._append({"finished": True})
+        self.finished = True
+        self.checkpoint()
+
+    # Write the pending records to disk
+    def checkpoint(self):
+        self.last_checkpoint = time.monotonic()
+        if not self.pending:
+            return
+        data = "".join(self.pending).encode("utf-8")
+        self.pending = []
+        while data:
+            data = data[os.write(self.fd, data):]
+        os.fsync(self.fd)
+
+    def close(self):
+        if self.fd is not None:
+            self.checkpoint()
+            os.close(self.fd)
+            self.fd = None
+
+    def _append(self, record):
+        self.pending.append(json.dumps(record) + "\n")
+        if time.monotonic() - self.last_checkpoint >= CHECKPOINT_SECONDS:
+            self.checkpoint()
@@ -0,0 +1,275 @@
+import hmac
+import http.client
+import ipaddress
+import json
+import os
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# How long a client waits when checking whether the daemon is running
+STATUS_TIMEOUT = 0.5
+
+# Header carrying the token that clients read from the token file
+TOKEN_HEADER = "X-Search-Token"
+
+
+# Directory for per-user settings: %APPDATA% on Windows, $XDG_CONFIG_HOME or ~/.config elsewhere
+def config_directory():
+    if os.name == "nt":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(base, "text-searcher")
+
+
+# File holding the daemon token, readable only by the user who runs the daemon
+DEFAULT_TOKEN_PATH = os.path.join(config_directory(), "daemon_token")
+
+
+# Return the token stored in a token file, or None if there is none
+def read_token(path=DEFAULT_TOKEN_PATH):
+    try:
+        with open(path, "r", encoding="ascii") as f:
+            return f.read().strip() or None
+    except (OSError, ValueError):
+        return None
+
+
+# Return the token of the token file, creating the file with a new token first.
+# A token that other users could have read is replaced. Raises OSError if the
+# file cannot be written.
+def ensure_token(path=DEFAULT_TOKEN_PATH):
+    token = read_token(path)
+    if token is not None and (os.name == "nt" or not os.stat(path).st_mode & 0o077):
+        return token
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    token = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="ascii") as f:
+        if os.name != "nt":
+            os.fchmod(fd, 0o600)
+        f.write(token + "\n")
+    return token
+
+
+# Split "host:port" into (host, port)
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+# True for localhost and loopback addresses such as 127.0.0.1
+def is_loopback(host):
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# Return why a search request cannot run, or None if it is valid
+def search_request_error(request):
+    if not isinstance(request, dict):
+        return "the request must be a JSON object"
+    search_text = request.get("search_text")
+    terms = request.get("terms")
+    if search_text is not None and not isinstance(search_text, str):
+        return "search_text must be a string"
+    if terms is not None and not (isinstance(terms, list) and all(isinstance(term, str) and term for term in terms)):
+        return "terms must be a list of non-empty strings"
+    if not search_text and not terms:
+        return "search_text or terms is required"
+    paths = request.get("paths")
+    if paths is not None and not (isinstance(paths, list) and all(isinstance(path, str) for path in paths)):
+        return "paths must be a list of strings"
+    if request.get("file_extension") is not None and not isinstance(request["file_extension"], str):
+        return "file_extension must be a string"
+    return None
+
+
+# Local HTTP server answering searches with the given functions:
+#   search(request)  generator of JSON-serializable results for a search request
+#   cancel()         stop the running search
+# Searches run one at a time; later requests wait for the running one. Only
+# requests carrying the token are answered (see ensure_token).
+# Raises ValueError for an address other than the loopback interface, since
+# anyone who can reach the daemon can list the files it can read.
+class SearchDaemon(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, search, cancel, token):
+        host, port = parse_address(address)
+        if not is_loopback(host):
+            raise ValueError(f"the search daemon only listens on the loopback interface, not on {host}")
+        super().__init__((host, port), SearchRequestHandler)
+        self.search = search
+        self.cancel = cancel
+        self.token = token
+        self.search_lock = threading.Lock()
+
+
+# Endpoints:
+#   GET  /status   {"status": "ok", "searching": bool}
+#   POST /search   JSON request (see search_request_error); streams one JSON
+#                  result per line, ending with {"done": true}
+#   POST /cancel   stop the running search
+# Requests must name a loopback host and carry the token in TOKEN_HEADER, and
+# POST bodies must be JSON. Other local users cannot read the token, and a web
+# page can neither read it nor send the header or a JSON body without a CORS
+# preflight, which the daemon does not answer.
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path != "/status":
+            self.send_error(404)
+            return
+        self._send_json({"status": "ok", "searching": self.server.search_lock.locked()})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.send_error(415, "Requests must be application/json")
+            return
+        if self.path == "/cancel":
+            self.server.cancel()
+            self._send_json({"status": "ok"})
+        elif self.path == "/search":
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except ValueError as e:
+                self.send_error(400, f"Invalid search request: {e}")
+                return
+            error = search_request_error(request)
+            if error is not None:
+                self.send_error(400, f"Invalid search request: {error}")
+                return
+            self._stream_search(request)
+        else:
+            self.send_error(404)
+
+    def _authorized(self):
+        host = self.headers.get("Host", "")
+        if ":" in host:
+            host = host.rsplit(":", 1)[0]
+        if not is_loopback(host):
+            self.send_error(403, "Only requests to localhost are accepted")
+            return False
+        # Header values are decoded as Latin-1, so they always encode back
+        token = self.headers.get(TOKEN_HEADER, "").encode("latin-1")
+        if not hmac.compare_digest(token, self.server.token.encode("ascii")):
+            self.send_error(403, "Missing or wrong search daemon token")
+            return False
+        return True
+
+    def _stream_search(self, request):
+        with self.server.search_lock:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            results = self.server.search(request)
+            try:
+                for result in results:
+                    self._write_line(result)
+                self._write_line({"done": True})
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away: stop the search instead of finishing it for nobody
+                self.server.cancel()
+            except Exception as e:
+                self._write_line({"error": str(e)})
+            finally:
+                results.close()
+
+    def _write_line(self, result):
+        self.wfile.write(json.dumps(result).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def _send_json(self, result):
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Searches are logged to success.log and unsuccessful.log
+
+
+def _connect(address, timeout=None):
+    host, port = parse_address(address)
+    return http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+def _headers(token_path):
+    return {TOKEN_HEADER: read_token(token_path) or "", "Content-Type": "application/json"}
+
+
+# Return the daemon's status, or None if no daemon this user may query is listening at the address
+def daemon_status(address, token_path=DEFAULT_TOKEN_PATH):
+    if read_token(token_path) is None:
+        return None
+    connection = _connect(address, STATUS_TIMEOUT)
+    try:
+        connection.request("GET", "/status", headers=_headers(token_path))
+        response = connection.getresponse()
+        if response.status != 200:
+            return None
+        return json.loads(response.read())
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    finally:
+        connection.close()
+
+
+# Send a search to the daemon and yield its results as they arrive:
+# {"path": ...} for a match (with "terms" for a terms search) and {"summary": ...} at the end.
+# Raises OSError if the daemon cannot be reached or the search fails.
+def daemon_search(
+    address, search_paths, search_text=None, terms=None, file_extension=None, token_path=DEFAULT_TOKEN_PATH
+):
+    request = {
+        # The daemon runs in its own working directory
+        "paths": [os.path.abspath(path) for path in search_paths],
+        "search_text": search_text,
+        "terms": list(terms or []),
+        "file_extension": file_extension,
+    }
+    connection = _connect(address)
+    try:
+        connection.request("POST", "/search", body=json.dumps(request), headers=_headers(token_path))
+        response = connection.getresponse()
+        if response.status != 200:
+            raise OSError(f"Search daemon returned {response.status} {response.reason}")
+        for line in response:
+            result = json.loads(line)
+            if result.get("done"):
+                return
+            if "error" in result:
+                raise OSError(f"Search daemon failed: {result['error']}")
+            yield result
+        raise OSError("Search daemon closed the connection")
+    finally:
+        connection.close()
+
+
+# Ask the daemon to stop the running search
+def cancel_daemon_search(address, token_path=DEFAULT_TOKEN_PATH):
+    connection = _connect(address, STATUS_TIMEOUT)
+    try:
+        connection.request("POST", "/cancel", body="{}", headers=_headers(token_path))
+        connection.getresponse().read()
+    except (OSError, http.client.HTTPException):
+        pass
+    finally:
+        connection.close()
+
+
+# Turn a daemon result back into what iter_search yields: a path, or (path, terms)
+def match_from_result(result):
+    if "terms" in result:
+        return result["path"], result["terms"]
+    return result["path"]
@@ -0,0 +1,90 @@
+import cProfile
+import heapq
+import json
+import os
+import time
+from collections import defaultdict
+
+# Number of slowest files kept for the report
+SLOWEST_FILES = 20
+
+
+# Throughput statistics of one search, fed with a record per processed file.
+# A record is (file_path, seconds, size_in_bytes, chunks) where chunks counts the
+# pages, paragraphs, shapes or rows the extractor produced.
+class SearchStats:
+    def __init__(self, slowest_files=SLOWEST_FILES):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.walk_seconds = 0.0
+        self.slowest_files = slowest_files
+        self.slowest = []  # Min-heap of (seconds, file_path, size)
+        self.formats = defaultdict(lambda: {"files": 0, "seconds": 0.0, "bytes": 0, "chunks": 0})
+
+    def record(self, file_stats):
+        file_path, seconds, size, chunks = file_stats
+        extension = os.path.splitext(file_path)[1].lower() or "(none)"
+        totals = self.formats[extension]
+        totals["files"] += 1
+        totals["seconds"] += seconds
+        totals["bytes"] += size
+        totals["chunks"] += chunks
+        entry = (seconds, file_path, size)
+        if len(self.slowest) < self.slowest_files:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    # Statistics as a JSON-serializable dict
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        files = sum(totals["files"] for totals in self.formats.values())
+        size = sum(totals["bytes"] for totals in self.formats.values())
+        formats = {}
+        for extension, totals in sorted(self.formats.items()):
+            formats[extension] = dict(
+                totals,
+                seconds=round(totals["seconds"], 3),
+                files_per_second=round(totals["files"] / totals["seconds"], 1) if totals["seconds"] else None,
+                mb_per_second=round(totals["bytes"] / 1e6 / totals["seconds"], 2) if totals["seconds"] else None,
+            )
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "walk_seconds": round(self.walk_seconds, 3),
+            "files": files,
+            "bytes": size,
+            "files_per_second": round(files / elapsed, 1) if elapsed else None,
+            "mb_per_second": round(size / 1e6 / elapsed, 2) if elapsed else None,
+            "formats": formats,
+            "slowest_files": [
+                {"path": file_path, "seconds": round(seconds, 3), "bytes": size}
+                for seconds, file_path, size in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+    # One line summary for the console and the GUI
+    def summary_line(self):
+        summary = self.summary()
+        return (
+            f"Processed {summary['files']} files ({summary['bytes'] / 1e6:.1f} MB) in {summary['elapsed_seconds']:.1f}s: "
+            f"{summary['files_per_second'] or 0} files/s, {summary['mb_per_second'] or 0} MB/s"
+        )
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+# Start profiling this process; returns a function that writes the profile to path
+def start_profiler(path):
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def dump():
+        profiler.disable()
+        profiler.dump_stats(path)
+
+    return dump
@@ -0,0 +1,222 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+# How often the supervisor checks running tasks against the time and memory limits
+CHECK_INTERVAL = 0.1
+
+# How long shutdown waits for an idle worker to exit before killing it
+EXIT_TIMEOUT = 5
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# Set on the future of a task whose worker process was killed or died
+class WorkerKilled(Exception):
+    pass
+
+
+# Resident memory of a process in bytes, or 0 where /proc is not available
+def resident_memory(pid):
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+# Log queue for the initializer arguments of a SupervisedPool, e.g. for a
+# logging.handlers.QueueHandler. In each worker it sends the records over the
+# worker's own pipe, and the pool hands them to the loggers of the main process.
+# A worker killed while logging only breaks its own pipe, never a shared queue.
+class PipeLogQueue:
+    def __init__(self):
+        self.connection = None
+
+    def put_nowait(self, record):
+        self.connection.send(("log", record))
+
+
+# Main loop of a worker process: run one task at a time and send back its result
+def _worker_main(connection, initializer, initargs):
+    for arg in initargs:
+        if isinstance(arg, PipeLogQueue):
+            arg.connection = connection
+    if initializer is not None:
+        initializer(*initargs)
+    connection.send(("ready", None))
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        function, args = task
+        try:
+            message = ("result", function(*args))
+        except BaseException as e:
+            message = ("error", e)
+        try:
+            connection.send(message)
+        except Exception as e:
+            # The result or the exception could not be pickled
+            connection.send(("error", RuntimeError(f"Could not send the task result: {e}")))
+
+
+class _Worker:
+    def __init__(self, process, connection):
+        self.process = process
+        self.connection = connection
+        self.ready = False
+        self.future = None
+        self.started = None
+
+
+# Process pool with the submit/shutdown interface of ProcessPoolExecutor that can
+# enforce a wall-clock timeout and a resident memory cap on every task. A worker
+# that exceeds a limit or dies is killed and replaced, and only its own task fails
+# with WorkerKilled; ProcessPoolExecutor would instead break the whole pool.
+# Each worker runs one task at a time. The memory cap needs /proc (Linux).
+class SupervisedPool:
+    def __init__(self, max_workers, mp_context, initializer=None, initargs=(), timeout=None, max_memory=None):
+        self.mp_context = mp_context
+        self.initializer = initializer
+        self.initargs = initargs
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.lock = threading.Lock()
+        self.pending = deque()  # (future, function, args) not yet sent to a worker
+        self.shutting_down = False
+        self.broken = None
+        self.workers = [self._start_worker() for _ in range(max_workers)]
+        self.supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self.supervisor.start()
+
+    def submit(self, function, *args):
+        future = Future()
+        with self.lock:
+            if self.broken is not None:
+                raise WorkerKilled(self.broken)
+            if self.shutting_down:
+                raise RuntimeError("cannot submit tasks after shutdown")
+            self.pending.append((future, function, args))
+            for worker in self.workers:
+                if worker.ready and worker.future is None:
+                    self._dispatch(worker)
+                    break
+        return future
+
+    # Wait for the running tasks and stop the workers
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self.lock:
+            self.shutting_down = True
+            if cancel_futures:
+                while self.pending:
+                    self.pending.popleft()[0].cancel()
+        if wait:
+            self.supervisor.join()
+        for worker in self.workers:
+            try:
+                worker.connection.send(None)
+            except OSError:
+                pass
+        for worker in self.workers:
+            worker.process.join(EXIT_TIMEOUT if wait else 0)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.connection.close()
+
+    def _start_worker(self):
+        parent_connection, child_connection = self.mp_context.Pipe()
+        process = self.mp_context.Process(
+            target=_worker_main, args=(child_connection, self.initializer, self.initargs), daemon=True
+        )
+        process.start()
+        child_connection.close()
+        return _Worker(process, parent_connection)
+
+    # Send the next pending task to an idle worker (called with the lock held)
+    def _dispatch(self, worker):
+        while self.pending:
+            future, function, args = self.pending.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue  # Cancelled while queued
+            try:
+                worker.connection.send((function, args))
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            worker.future = future
+            worker.started = time.monotonic()
+            return
+
+    def _supervise(self):
+        while True:
+            with self.lock:
+                busy = any(worker.future is not None for worker in self.workers)
+                if self.shutting_down and not busy and not self.pending:
+                    return
+                waitables = [worker.connection for worker in self.workers]
+                waitables += [worker.process.sentinel for worker in self.workers]
+            ready = wait(waitables, timeout=CHECK_INTERVAL)
+            with self.lock:
+                now = time.monotonic()
+                for worker in list(self.workers):
+                    if worker.connection in ready or worker.process.sentinel in ready:
+                        self._receive(worker)
+                    elif worker.future is not None:
+                        self._check_limits(worker, now)
+
+    # Handle a message from a worker, or its exit (called with the lock held)
+    def _receive(self, worker):
+        try:
+            kind, value = worker.connection.recv()
+        except (EOFError, OSError):
+            worker.process.join()
+            self._replace(worker, f"worker process exited with code {worker.process.exitcode}")
+            return
+        if kind == "log":
+            logging.getLogger(value.name).handle(value)
+            return  # The task is still running
+        if kind == "ready":
+            worker.ready = True
+        elif kind == "result":
+            worker.future.set_result(value)
+            worker.future = None
+        else:
+            worker.future.set_exception(value)
+            worker.future = None
+        self._dispatch(worker)
+
+    def _check_limits(self, worker, now):
+        if self.timeout is not None and now - worker.started > self.timeout:
+            reason = f"timed out after {self.timeout:g} s"
+        elif self.max_memory is not None and resident_memory(worker.process.pid) > self.max_memory:
+            reason = f"used more than {self.max_memory // (1024 * 1024)} MB of memory"
+        else:
+            return
+        worker.process.kill()
+        worker.process.join()
+        self._replace(worker, reason)
+
+    # Fail the task of a dead worker and start a new worker in its place (called with the lock held)
+    def _replace(self, worker, reason):
+        worker.connection.close()
+        if worker.future is not None:
+            worker.future.set_exception(WorkerKilled(reason))
+        if not worker.ready:
+            # A worker that dies while starting up would die again: stop using the pool
+            self.broken = f"worker process failed to start ({reason})"
+            self.workers.remove(worker)
+            while self.pending:
+                future = self.pending.popleft()[0]
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(WorkerKilled(self.broken))
+            return
+        self.workers[self.workers.index(worker)] = self._start_worker()
@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Default location and size cap of the extracted text cache
+DEFAULT_CACHE_PATH = "text_cache.db"
+DEFAULT_CACHE_SIZE_MB = 1024
+
+# Only refresh the LRU timestamp of an entry once per this many seconds,
+# so repeat searches do not turn every cache hit into a write
+LRU_RESOLUTION = 3600
+
+# Check the size cap after this many new entries
+TRIM_INTERVAL = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS texts (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    data BLOB,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS texts_last_used ON texts (last_used);
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    partial BLOB,
+    full BLOB,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_last_used ON hashes (last_used);
+"""
+
+
+# On-disk cache of extracted text keyed by (path, size, mtime_ns, inode)
+class TextCache:
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.puts_since_trim = 0
+        # Several worker processes share the database, so wait for locks instead of failing
+        self.connection = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    # Return (hit, text); text is None when the file is cached as unreadable
+    def get(self, path, stat):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size, mtime_ns, inode, failed, data, last_used FROM texts WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None:
+                return False, None
+            size, mtime_ns, inode, failed, data, last_used = row
+            if (size, mtime_ns, inode) != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+                return False, None
+            now = time.time()
+            if now - last_used > LRU_RESOLUTION:
+                self.connection.execute("UPDATE texts SET last_used = ? WHERE path = ?", (now, path))
+        if failed:
+            return True, None
+        return True, zlib.decompress(data).decode("utf-8")
+
+    # True if the text of the file, or its failure, is cached for its current version
+    def contains(self, path, stat):
+        with self.lock:
+            row = self.connection.execute("SELECT size, mtime_ns, inode FROM texts WHERE path = ?", (path,)).fetchone()
+        return row is not None and tuple(row) == (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    # Return the (partial, full) content hashes stored for the current version of
+    # a file; either is None when it was not computed
+    def get_hashes(self, path, stat):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size, mtime_ns, inode, partial, full, last_used FROM hashes WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None or tuple(row[:3]) != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+                return None, None
+            now = time.time()
+            if now - row[5] > LRU_RESOLUTION:
+                self.connection.execute("UPDATE hashes SET last_used = ? WHERE path = ?", (now, path))
+        return row[3], row[4]
+
+    # Store the content hashes of a file (see dedup.Deduplicator)
+    def put_hashes(self, path, stat, partial, full=None):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO hashes (path, size, mtime_ns, inode, partial, full, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, partial, full, time.time()),
+            )
+
+    # Store the text of a file, or None to remember that it could not be read
+    def put(self, path, stat, text):
+        data = None if text is None else zlib.compress(text.encode("utf-8", errors="replace"), 1)
+        nbytes = len(path) + (len(data) if data else 0)
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO texts (path, size, mtime_ns, inode, failed, data, nbytes, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, int(text is None), data, nbytes, time.time()),
+            )
+            self.puts_since_trim += 1
+            if self.puts_since_trim >= TRIM_INTERVAL:
+                self._trim()
+
+    # Drop a file from the cache
+    def remove(self, path):
+        with self.lock:
+            self.connection.execute("DELETE FROM texts WHERE path = ?", (path,))
+            self.connection.execute("DELETE FROM hashes WHERE path = ?", (path,))
+
+    # Drop every entry whose path starts with a prefix, e.g. the files under a directory
+    def remove_prefix(self, prefix):
+        with self.lock:
+            self.connection.execute("DELETE FROM texts WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+            self.connection.execute("DELETE FROM hashes WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+
+    # Evict least recently used entries until the cache fits its size cap
+    def trim(self):
+        with self.lock:
+            self._trim()
+
+    def _trim(self):
+        self.puts_since_trim = 0
+        total = self.connection.execute("SELECT COALESCE(SUM(nbytes), 0) FROM texts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the cap so the next few inserts do not trigger another pass
+        excess = total - int(self.max_bytes * 0.9)
+        evicted = []
+        for path, nbytes, last_used in self.connection.execute(
+            "SELECT path, nbytes, last_used FROM texts ORDER BY last_used"
+        ):
+            evicted.append((path,))
+            excess -= nbytes
+            if excess <= 0:
+                break
+        self.connection.executemany("DELETE FROM texts WHERE path = ?", evicted)
+        # Hashes are also stored for files whose text is not cached, such as plain
+        # text files, so they are evicted by age along with the texts
+        self.connection.execute("DELETE FROM hashes WHERE last_used <= ?", (last_used,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+# Per-process cache settings and the lazily opened cache itself
+_cache_settings = None
+_cache = None
+
+
+# Enable the cache for this process (db_path None disables it)
+def configure_text_cache(db_path=DEFAULT_CACHE_PATH, size_mb=DEFAULT_CACHE_SIZE_MB):
+    global _cache_settings, _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+    _cache_settings = (db_path, size_mb) if db_path else None
+
+
+# Settings to hand to worker processes so they open the same cache
+def text_cache_settings():
+    return _cache_settings or (None, DEFAULT_CACHE_SIZE_MB)
+
+
+# Return the cache for this process, or None if caching is disabled
+def get_text_cache():
+    global _cache
+    if _cache is None and _cache_settings is not None:
+        db_path, size_mb = _cache_settings
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        _cache = TextCache(db_path, size_mb * 1024 * 1024)
+    return _cache
@@ -0,0 +1,341 @@
+import heapq
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+from array import array
+from collections import defaultdict
+from itertools import groupby
+
+# Default directory holding the index files
+DEFAULT_INDEX_DIR = "search_index"
+
+FILES_DB = "files.db"
+POSTINGS_FILE = "postings.bin"
+
+# Posting lists of the files indexed since the last merge, one file per commit
+SEGMENT_FILE = "postings-{}.bin"
+
+# Merge the segments into postings.bin once there are more than this many
+MAX_SEGMENTS = 8
+
+# Posting entries (4 bytes each) collected in memory before they are written out
+# as a segment, which bounds the memory used to index many files at once
+RUN_POSTINGS = 8 * 1024 * 1024
+
+# Files read from the database at a time when writing segments
+FILE_BATCH = 1000
+
+# Layout of postings.bin and the segment files (little endian):
+#   header   magic (4 bytes), number of trigrams (u32)
+#   table    one (trigram, offset, count) u32 triple per trigram, sorted by trigram
+#   postings u32 file ids, each trigram's ids stored contiguously and sorted
+MAGIC = b"TRI1"
+HEADER = struct.Struct("<4sI")
+ENTRY = struct.Struct("<III")
+
+# files.segment is the segment holding the file's current trigrams (0 is
+# postings.bin), or NULL until the next commit writes them
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    trigrams BLOB NOT NULL,
+    segment INTEGER
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY
+);
+"""
+
+
+# Return the sorted unique UTF-8 byte trigrams of a text as one blob of 3-byte records.
+# Any substring of the text contains only trigrams of the text, so the index never misses a match.
+def text_trigrams(text):
+    data = text.encode("utf-8", errors="surrogatepass")
+    grams = {data[i:i + 3] for i in range(len(data) - 2)}
+    return b"".join(sorted(grams))
+
+
+def _trigram_code(trigram):
+    return int.from_bytes(trigram, "big")
+
+
+# True if an index was built in the directory; searching needs its posting lists
+def index_exists(index_dir=DEFAULT_INDEX_DIR):
+    return os.path.exists(os.path.join(index_dir, POSTINGS_FILE))
+
+
+# Write posting lists (trigram code -> sorted array of file ids) in the postings layout
+def _write_postings_file(path, postings):
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        codes = sorted(postings)
+        f.write(HEADER.pack(MAGIC, len(codes)))
+        offset = 0
+        for code in codes:
+            f.write(ENTRY.pack(code, offset, len(postings[code])))
+            offset += len(postings[code])
+        for code in codes:
+            postings[code].tofile(f)
+    os.replace(temp_path, path)
+
+
+# A memory-mapped postings file
+class _PostingsFile:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.trigram_count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a trigram index")
+        self.postings_start = HEADER.size + self.trigram_count * ENTRY.size
+
+    def ids(self, offset, count):
+        start = self.postings_start + offset * 4
+        ids = array("I")
+        ids.frombytes(self.data[start:start + count * 4])
+        return ids
+
+    # Binary search the trigram table and return the file ids posted for a trigram
+    def posting_list(self, code):
+        low, high = 0, self.trigram_count
+        while low < high:
+            middle = (low + high) // 2
+            entry_code, offset, count = ENTRY.unpack_from(self.data, HEADER.size + middle * ENTRY.size)
+            if entry_code < code:
+                low = middle + 1
+            elif entry_code > code:
+                high = middle
+            else:
+                return self.ids(offset, count)
+        return array("I")
+
+    # Yield the entries of the table in trigram order as (trigram code, segment id, self, offset, count)
+    def entries(self, segment_id):
+        for index in range(self.trigram_count):
+            code, offset, count = ENTRY.unpack_from(self.data, HEADER.size + index * ENTRY.size)
+            yield code, segment_id, self, offset, count
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+# Trigram inverted index over the extracted text of indexed files. The posting
+# lists live in postings.bin and in one small segment file per later commit, so
+# updating a few files only writes their trigrams. Once there are more than
+# MAX_SEGMENTS segments, they are merged back into postings.bin.
+class TrigramIndex:
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(index_dir, FILES_DB))
+        self.connection.executescript(SCHEMA)
+        self._upgrade()
+        self.connection.execute("CREATE INDEX IF NOT EXISTS files_segment ON files (segment)")
+        self.segments = None  # (segment id, _PostingsFile) pairs once opened
+
+    # Indexes built before segments were added hold every file in postings.bin
+    def _upgrade(self):
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(files)")]
+        if "segment" in columns:
+            return
+        self.connection.execute("ALTER TABLE files ADD COLUMN segment INTEGER")
+        if index_exists(self.index_dir):
+            self.connection.execute("UPDATE files SET segment = 0")
+            self.connection.execute("INSERT OR IGNORE INTO segments (id) VALUES (0)")
+        self.connection.commit()
+
+    # True if the file is new or changed since it was indexed
+    def needs_update(self, path, stat):
+        row = self.connection.execute("SELECT size, mtime_ns, inode FROM files WHERE path = ?", (path,)).fetchone()
+        return row is None or tuple(row) != (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    # Store the trigrams of a file (as returned by text_trigrams); the next
+    # commit writes them to a segment
+    def update(self, path, stat, trigrams):
+        self.connection.execute(
+            "INSERT INTO files (path, size, mtime_ns, inode, trigrams, segment) VALUES (?, ?, ?, ?, ?, NULL) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+            "inode = excluded.inode, trigrams = excluded.trigrams, segment = NULL",
+            (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, trigrams),
+        )
+
+    # Drop a file from the index. Its ids stay in the posting lists until the
+    # next merge, but no longer resolve to a path.
+    def remove(self, path):
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    # Drop indexed files under the given roots that were not seen by the last walk
+    def remove_missing(self, roots, seen_paths):
+        for (path,) in self.connection.execute("SELECT path FROM files").fetchall():
+            if path not in seen_paths and is_under_roots(path, roots):
+                self.remove(path)
+
+    # Commit file changes and write the trigrams of the files updated since the
+    # last commit as a new segment, merging the segments when there are too many
+    def commit(self):
+        self.connection.commit()
+        self._close_postings()  # Reopened with the new segments by the next search
+        self._write_updates()
+        segment_ids = self._segment_ids()
+        if not segment_ids:
+            self._add_segment({}, [])  # An empty index still has its postings.bin
+        elif len(segment_ids) > MAX_SEGMENTS:
+            self._merge_segments(segment_ids)
+
+    def _segment_path(self, segment_id):
+        return os.path.join(self.index_dir, POSTINGS_FILE if segment_id == 0 else SEGMENT_FILE.format(segment_id))
+
+    def _segment_ids(self):
+        return [segment_id for (segment_id,) in self.connection.execute("SELECT id FROM segments ORDER BY id")]
+
+    # Write the trigrams of files without a segment, in runs of at most RUN_POSTINGS entries
+    def _write_updates(self):
+        postings = defaultdict(lambda: array("I"))
+        file_ids = []
+        entries = 0
+        last_id = -1
+        while True:
+            # Rows come out in id order, so every posting list is already sorted
+            rows = self.connection.execute(
+                "SELECT id, trigrams FROM files WHERE segment IS NULL AND id > ? ORDER BY id LIMIT ?",
+                (last_id, FILE_BATCH),
+            ).fetchall()
+            if not rows:
+                break
+            for file_id, trigrams in rows:
+                for i in range(0, len(trigrams), 3):
+                    postings[_trigram_code(trigrams[i:i + 3])].append(file_id)
+                file_ids.append(file_id)
+                entries += len(trigrams) // 3
+                if entries >= RUN_POSTINGS:
+                    self._add_segment(postings, file_ids)
+                    postings = defaultdict(lambda: array("I"))
+                    file_ids = []
+                    entries = 0
+            last_id = rows[-1][0]
+        if file_ids:
+            self._add_segment(postings, file_ids)
+
+    # Write posting lists as the next segment and record it as the current segment of its files
+    def _add_segment(self, postings, file_ids):
+        segment_id = self.connection.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM segments").fetchone()[0]
+        _write_postings_file(self._segment_path(segment_id), postings)
+        with self.connection:
+            self.connection.execute("INSERT INTO segments (id) VALUES (?)", (segment_id,))
+            self.connection.executemany(
+                "UPDATE files SET segment = ? WHERE id = ?", ((segment_id, file_id) for file_id in file_ids)
+            )
+
+    # Merge all segments into a new postings.bin, dropping the ids of files that
+    # were removed or indexed again in a later segment. The posting lists are
+    # streamed in trigram order, so only the trigram table is kept in memory.
+    def _merge_segments(self, segment_ids):
+        self._close_postings()
+        max_id = self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM files").fetchone()[0]
+        current = array("i", [-1]) * (max_id + 1)  # file id -> segment holding its trigrams
+        for file_id, segment_id in self.connection.execute("SELECT id, segment FROM files WHERE segment IS NOT NULL"):
+            current[file_id] = segment_id
+
+        sources = [(segment_id, _PostingsFile(self._segment_path(segment_id))) for segment_id in segment_ids]
+        temp_path = self._segment_path(0) + ".tmp"
+        table = array("I")
+        offset = 0
+        try:
+            with open(temp_path + ".ids", "wb") as ids_file:
+                streams = [source.entries(segment_id) for segment_id, source in sources]
+                merged = heapq.merge(*streams, key=lambda entry: entry[:2])
+                for code, entries in groupby(merged, key=lambda entry: entry[0]):
+                    ids = array("I")
+                    for _, segment_id, source, start, count in entries:
+                        ids.extend(
+                            file_id
+                            for file_id in source.ids(start, count)
+                            if file_id <= max_id and current[file_id] == segment_id
+                        )
+                    if ids:
+                        ids = array("I", sorted(ids))
+                        table.extend((code, offset, len(ids)))
+                        offset += len(ids)
+                        ids.tofile(ids_file)
+            with open(temp_path, "wb") as f, open(temp_path + ".ids", "rb") as ids_file:
+                f.write(HEADER.pack(MAGIC, len(table) // 3))
+                table.tofile(f)
+                shutil.copyfileobj(ids_file, f)
+        finally:
+            for _, source in sources:
+                source.close()
+            if os.path.exists(temp_path + ".ids"):
+                os.remove(temp_path + ".ids")
+
+        # Until the database is updated the new postings.bin is only used for
+        # the files already in segment 0, and the others are still found in their segments
+        os.replace(temp_path, self._segment_path(0))
+        with self.connection:
+            self.connection.execute("UPDATE files SET segment = 0 WHERE segment IS NOT NULL")
+            self.connection.execute("DELETE FROM segments WHERE id != 0")
+        for segment_id in segment_ids:
+            if segment_id != 0:
+                try:
+                    os.remove(self._segment_path(segment_id))
+                except OSError:
+                    pass  # Still open in another process on Windows; the next segment with its id replaces it
+
+    def _open_postings(self):
+        if self.segments is None:
+            self.segments = [
+                (segment_id, _PostingsFile(self._segment_path(segment_id))) for segment_id in self._segment_ids()
+            ]
+
+    def _close_postings(self):
+        if self.segments is not None:
+            for _, segment in self.segments:
+                segment.close()
+            self.segments = None
+
+    # Return the paths of indexed files that may contain the search text
+    def candidates(self, search_text):
+        self._open_postings()
+        trigrams = text_trigrams(search_text)
+        if not trigrams:
+            # Too short to use the index: every indexed file is a candidate
+            return [path for (path,) in self.connection.execute("SELECT path FROM files ORDER BY id")]
+
+        codes = [_trigram_code(trigrams[i:i + 3]) for i in range(0, len(trigrams), 3)]
+        found = []  # (file id, segment id)
+        for segment_id, segment in self.segments:
+            file_ids = None
+            for ids in sorted((segment.posting_list(code) for code in codes), key=len):
+                file_ids = set(ids) if file_ids is None else file_ids.intersection(ids)
+                if not file_ids:
+                    break
+            found.extend((file_id, segment_id) for file_id in file_ids)
+
+        paths = []
+        for file_id, segment_id in sorted(found):
+            row = self.connection.execute("SELECT path, segment FROM files WHERE id = ?", (file_id,)).fetchone()
+            # Ids of removed files, and of files since indexed in a later segment, are stale
+            if row is not None and row[1] == segment_id:
+                paths.append(row[0])
+        return paths
+
+    def close(self):
+        self._close_postings()
+        self.connection.close()
+
+
+# True if a path lies inside one of the given directories
+def is_under_roots(path, roots):
+    for root in roots:
+        root = os.path.join(os.path.abspath(root), "")
+        if path.startswith(root) or path == root.rstrip(os.sep):
+            return True
+    return False
@@ -0,0 +1,277 @@
+import fnmatch
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Filesystem types that only expose kernel state and never hold documents
+PSEUDO_FILESYSTEMS = {
+    "autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs", "debugfs", "devpts",
+    "devtmpfs", "efivarfs", "fusectl", "hugetlbfs", "mqueue", "nsfs", "proc", "pstore",
+    "rpc_pipefs", "securityfs", "selinuxfs", "sysfs", "tracefs",
+}
+
+# Used when the mount table cannot be read
+DEFAULT_PSEUDO_MOUNTS = {"/proc", "/sys", "/dev"}
+
+# Directories modified this recently are not cached: a change within the same
+# mtime tick would not be noticed
+LISTING_SETTLE_NS = 2 * 10**9
+
+
+# Return the mount points of pseudo filesystems on this machine
+def pseudo_mount_points():
+    if sys.platform != "linux":
+        return set()
+    try:
+        with open("/proc/self/mounts", "r", encoding="utf-8", errors="replace") as f:
+            mounts = set()
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3 and fields[2] in PSEUDO_FILESYSTEMS:
+                    # Spaces and other special characters are octal escaped in the mount table
+                    mounts.add(re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[1]))
+            return mounts or DEFAULT_PSEUDO_MOUNTS
+    except OSError:
+        return DEFAULT_PSEUDO_MOUNTS
+
+
+# Translate one .gitignore pattern into (regex, negated, directories_only), or None for blanks and comments
+def compile_ignore_pattern(line):
+    line = line.rstrip("\n").rstrip()
+    if not line or line.startswith("#"):
+        return None
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+    directories_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # A slash anywhere but the end anchors the pattern to the ignore file's directory
+    anchored = "/" in line
+    line = line.lstrip("/")
+
+    regex = ""
+    i = 0
+    while i < len(line):
+        if line.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif line.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif line[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif line[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif line[i] == "[" and "]" in line[i + 1:]:
+            end = line.index("]", i + 1)
+            regex += "[" + line[i + 1:end].replace("!", "^", 1) + "]"
+            i = end + 1
+        else:
+            regex += re.escape(line[i])
+            i += 1
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(regex + r"\Z"), negated, directories_only
+
+
+# Read the patterns of an ignore file
+def read_ignore_file(path):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return [rule for rule in map(compile_ignore_pattern, f) if rule]
+    except OSError:
+        return []
+
+
+# Directory walker built on os.scandir.
+#   extensions      only yield files ending in one of these (e.g. the supported types)
+#   containers      also yield files ending in one of these (e.g. archives) whatever the
+#                   extension filter of a walk, which then applies to their contents
+#   exclude         glob patterns matched against entry names and full paths
+#   ignore_file     name of .gitignore-style files whose patterns apply to their subtree
+#   same_device     do not cross into other filesystems (like find -xdev)
+#   skip_pseudo     prune /proc, /sys, /dev and other pseudo filesystems
+#   threads         scan this many directories concurrently (for high-latency storage)
+#   cache_listings  remember directory listings and only rescan directories whose
+#                   modification time changed (for long-running processes)
+class Walker:
+    def __init__(
+        self, extensions=None, exclude=(), ignore_file=None, same_device=False, skip_pseudo=True, threads=1,
+        cache_listings=False, containers=(),
+    ):
+        self.containers = tuple(containers)
+        self.extensions = tuple(extensions) + self.containers if extensions else None
+        self.exclude = [re.compile(fnmatch.translate(pattern)) for pattern in exclude]
+        self.ignore_file = ignore_file
+        self.same_device = same_device
+        self.skip_dirs = pseudo_mount_points() if skip_pseudo else set()
+        self.threads = threads
+        self.listings = {} if cache_listings else None  # path -> (mtime_ns, entries)
+
+    # Yield the paths of the files under a directory, optionally filtered by extension
+    def walk(self, directory, file_extension=None):
+        accept = self._file_filter(file_extension)
+        try:
+            root_device = os.stat(directory).st_dev if self.same_device else None
+        except OSError:
+            return
+        if self.threads > 1:
+            yield from self._walk_parallel(directory, accept, root_device)
+            return
+
+        # Depth first, files of a directory before its subdirectories, like os.walk
+        stack = [(directory, ())]
+        while stack:
+            files, subdirectories = self._scan(*stack.pop(), accept, root_device)
+            yield from files
+            stack.extend(reversed(subdirectories))
+
+    # Yield the directories a walk of this directory visits, starting with the directory itself
+    def directories(self, directory):
+        try:
+            root_device = os.stat(directory).st_dev if self.same_device else None
+        except OSError:
+            return
+        no_files = lambda name: False
+        stack = [(directory, ())]
+        while stack:
+            path, ignore_rules = stack.pop()
+            yield path
+            _, subdirectories = self._scan(path, ignore_rules, no_files, root_device)
+            stack.extend(reversed(subdirectories))
+
+    # True if a walk of root would yield the file at path; the file need not exist
+    # any more. Checks the same filters as a walk except the filesystem boundary.
+    def accepts(self, root, path, file_extension=None):
+        if not self._file_filter(file_extension)(os.path.basename(path)):
+            return False
+        names = os.path.relpath(path, root).split(os.sep)
+        if names[0] in (os.curdir, os.pardir):
+            return False
+        ignore_rules = ()
+        directory = root
+        for depth, name in enumerate(names):
+            if self.ignore_file:
+                rules = read_ignore_file(os.path.join(directory, self.ignore_file))
+                if rules:
+                    ignore_rules = ignore_rules + ((directory, rules),)
+            directory = os.path.join(directory, name)
+            is_directory = depth < len(names) - 1
+            if self._excluded(name, directory, is_directory, ignore_rules):
+                return False
+            if is_directory and directory in self.skip_dirs:
+                return False
+        return True
+
+    def _walk_parallel(self, directory, accept, root_device):
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            pending = {executor.submit(self._scan, directory, (), accept, root_device)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subdirectories = future.result()
+                    for subdirectory in subdirectories:
+                        pending.add(executor.submit(self._scan, *subdirectory, accept, root_device))
+                    yield from files
+
+    # Build the per-file test once per walk: a suffix tuple check or one compiled glob
+    def _file_filter(self, file_extension):
+        if file_extension and any(char in file_extension for char in "*?["):
+            pattern = re.compile(fnmatch.translate(f"*{file_extension}"))
+            extension_ok = lambda name: pattern.match(os.path.normcase(name)) is not None
+        elif file_extension:
+            suffix = os.path.normcase(file_extension)
+            extension_ok = lambda name: os.path.normcase(name).endswith(suffix)
+        else:
+            extension_ok = lambda name: True
+        if self.containers:
+            file_ok = extension_ok
+            extension_ok = lambda name: file_ok(name) or name.endswith(self.containers)
+        if self.extensions is None:
+            return extension_ok
+        return lambda name: name.endswith(self.extensions) and extension_ok(name)
+
+    # Scan one directory and return its matching files and the subdirectories to visit.
+    # ignore_rules holds (base directory, rules) for every ignore file above this directory.
+    def _scan(self, path, ignore_rules, accept, root_device):
+        files = []
+        subdirectories = []
+        if self.ignore_file:
+            rules = read_ignore_file(os.path.join(path, self.ignore_file))
+            if rules:
+                ignore_rules = ignore_rules + ((path, rules),)
+        for name, entry_path, is_directory, is_file, device in self._list(path):
+            if self._excluded(name, entry_path, is_directory, ignore_rules):
+                continue
+            if is_directory:
+                if entry_path in self.skip_dirs:
+                    continue
+                if root_device is not None and device != root_device:
+                    continue
+                subdirectories.append((entry_path, ignore_rules))
+            elif is_file and accept(name):
+                files.append(entry_path)
+        return files, subdirectories
+
+    # List a directory as (name, path, is_directory, is_file, device) tuples,
+    # from the listing cache while the directory is unchanged
+    def _list(self, path):
+        if self.listings is not None:
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                return []
+            cached = self.listings.get(path)
+            if cached is not None and cached[0] == mtime_ns:
+                return cached[1]
+
+        entries = []
+        try:
+            with os.scandir(path) as scanned:
+                for entry in scanned:
+                    try:
+                        # d_type from the directory listing: no stat call needed
+                        is_directory = entry.is_dir(follow_symlinks=False)
+                        is_file = (
+                            not is_directory
+                            and (self.extensions is None or entry.name.endswith(self.extensions))
+                            and entry.is_file()
+                        )
+                        device = self._device(entry) if is_directory and self.same_device else None
+                    except OSError:
+                        continue
+                    entries.append((entry.name, entry.path, is_directory, is_file, device))
+        except OSError:
+            return []  # Inaccessible directories are ignored
+
+        if self.listings is not None and time.time_ns() - mtime_ns > LISTING_SETTLE_NS:
+            self.listings[path] = (mtime_ns, entries)
+        return entries
+
+    def _device(self, entry):
+        # DirEntry.stat() leaves st_dev at zero on Windows
+        if sys.platform == "win32":
+            return os.stat(entry.path).st_dev
+        return entry.stat(follow_symlinks=False).st_dev
+
+    def _excluded(self, name, path, is_directory, ignore_rules):
+        for pattern in self.exclude:
+            if pattern.match(name) or pattern.match(path):
+                return True
+        ignored = False
+        for base, rules in ignore_rules:
+            relative = os.path.relpath(path, base).replace(os.sep, "/")
+            for pattern, negated, directories_only in rules:
+                if directories_only and not is_directory:
+                    continue
+                if pattern.match(relative):
+                    ignored = not negated
+        return ignored
@@ -0,0 +1,187 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+# Reported instead of paths when changes may have been missed and everything
+# has to be checked again
+RESCAN = "<rescan>"
+
+# Changes are handed out once no new event arrived for this long...
+QUIET_SECONDS = 0.5
+# ...or at the latest this long after the first change of a batch
+MAX_BATCH_DELAY = 5
+
+# Interval of the polling watcher when none is given
+DEFAULT_POLL_INTERVAL = 10
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; followed by the name
+READ_SIZE = 64 * 1024
+
+
+# Watches the directories a Walker visits under some roots with Linux inotify.
+# Files are reported once they are closed after writing, moved in, moved out or
+# deleted; directories that are deleted or moved out are reported as one path.
+class InotifyWatcher:
+    def __init__(self, roots, walker):
+        self.walker = walker
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}  # watch descriptor -> directory
+        try:
+            for root in roots:
+                self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    # Watch a directory and the subdirectories the walker would visit.
+    # Raises OSError when the inotify watch limit is reached.
+    def _watch_tree(self, directory):
+        for path in self.walker.directories(directory):
+            wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.EACCES, errno.ENOTDIR):
+                    continue  # Gone or unreadable: the walk skips it too
+                raise OSError(error, os.strerror(error), path)
+            self.watches[wd] = path
+
+    # Wait up to timeout seconds and return the changed paths
+    def read_events(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0")
+            offset += EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                paths.append(RESCAN)
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may have been added before the watch was in place
+                    try:
+                        self._watch_tree(path)
+                    except OSError:
+                        paths.append(RESCAN)
+                    paths.extend(self.walker.walk(path))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    # Events from a moved directory would carry its old path
+                    prefix = os.path.join(path, "")
+                    for wd, watched in list(self.watches.items()):
+                        if watched == path or watched.startswith(prefix):
+                            del self.watches[wd]
+                    paths.append(path)
+            elif not mask & IN_CREATE:
+                # A new file is reported when it is closed after writing
+                paths.append(path)
+        return paths
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+# Finds changes by walking the roots every interval seconds and comparing size,
+# modification time and inode of every file. Works on any platform and on
+# network shares, where inotify does not see changes made by other machines.
+class PollingWatcher:
+    def __init__(self, roots, walker, interval=DEFAULT_POLL_INTERVAL):
+        self.roots = roots
+        self.walker = walker
+        self.interval = interval
+        self.snapshot = self._scan()
+        self.next_poll = time.monotonic() + interval
+
+    def _scan(self):
+        snapshot = {}
+        for root in self.roots:
+            for path in self.walker.walk(root):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        return snapshot
+
+    # Wait up to timeout seconds and return the changed paths
+    def read_events(self, timeout):
+        remaining = self.next_poll - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(remaining, 0))
+        snapshot = self._scan()
+        self.next_poll = time.monotonic() + self.interval
+        paths = [path for path, state in snapshot.items() if self.snapshot.get(path) != state]
+        paths.extend(path for path in self.snapshot if path not in snapshot)
+        self.snapshot = snapshot
+        return paths
+
+    def close(self):
+        pass
+
+
+# Watch the roots with inotify where possible, and by polling otherwise (or when
+# a poll interval is given, e.g. for network shares)
+def create_watcher(roots, walker, poll_interval=None):
+    if poll_interval is None and sys.platform == "linux":
+        try:
+            return InotifyWatcher(roots, walker)
+        except OSError:
+            pass  # No inotify, or more directories than the inotify watch limit
+    return PollingWatcher(roots, walker, poll_interval or DEFAULT_POLL_INTERVAL)
+
+
+# Yield sets of changed paths from a watcher, batching the events of quick
+# successive writes, until the cancellation event is set
+def watch_changes(watcher, cancel_event=None):
+    changes = set()
+    first_change = None
+    while cancel_event is None or not cancel_event.is_set():
+        paths = watcher.read_events(QUIET_SECONDS)
+        if paths:
+            changes.update(paths)
+            if first_change is None:
+                first_change = time.monotonic()
+        if changes and (not paths or time.monotonic() - first_change > MAX_BATCH_DELAY):
+            yield changes
+            changes = set()
+            first_change = None